@@ -1,12 +1,15 @@
 import flet as ft
 import os
 import re
+import glob
+import shutil
 import time
 import subprocess
-from threading import Thread, Lock
+from collections import OrderedDict
+from threading import Thread, Lock, Event
 from pathlib import Path
 from datetime import datetime
-import yt_dlp
+from yt_dlp.utils import DownloadCancelled
 from pytubefix import YouTube
 import traceback
 import urllib.parse
@@ -52,17 +55,119 @@ if 'youtubesearchpython' in sys.modules:
 # Import torrent panel
 from torrent_panel import TorrentPanel
 
+# Import download scheduling and media post-processing
+from download_manager import (
+    DownloadScheduler, BandwidthLimiter, QueueRegistry, DownloadStates, RetryPolicy, CircuitBreaker, DiskSpaceGuard,
+    FragmentTuner, QUEUED, FETCHING, DOWNLOADING, POSTPROCESSING, PAUSED, DONE, FAILED, CANCELLED,
+    FRAGMENTED_PROTOCOLS, is_retryable_error, get_http_status,
+)
+from media_processing import TranscodePool, plan_audio_conversion, cap_audio_bitrate, get_source_bitrate
+from format_selector import select_video_formats, get_format_string, get_fallback_format_string, get_format_size
+from queue_store import DownloadArchive, QueueStore, HistoryStore
+from queue_view import VirtualQueueView, STATUS_FILTERS
+from history_panel import HistoryPanel
+from ydl_pool import YoutubeDLPool
+from segmented_downloader import (
+    SegmentedDownloader, DEFAULT_CONNECTIONS, supports_segmented_download, discard_segmented_part,
+)
+
+# Links accepted besides the supported sites: media files served directly over HTTP(S)
+DIRECT_MEDIA_PATTERN = r'^https?:\/\/[^\s?#]+\.(mp4|mkv|webm|mov|avi|m4v|mp3|m4a|aac|flac|ogg|opus|wav)([?#].*)?$'
+
+# Stream URLs inside a cached info dict expire after a few hours
+VIDEO_INFO_MAX_AGE = 4 * 60 * 60
+
+# Progress hooks only mark the UI dirty; the render loop flushes it at most this often
+UI_REFRESH_INTERVAL = 0.1  # 10 Hz
+
+# Appearance of a freshly queued video row; each item keeps its own copy in queue_item['view']
+QUEUE_ROW_DEFAULTS = {
+    'status': "Queued",
+    'status_color': "#555555",
+    'progress': 0,
+    'paused': False,
+    'download_enabled': True,
+    'pause_enabled': False,
+    'folder_enabled': False,
+    'audio': "",
+    'expanded': False,
+}
+
+# Queue state saved for each download state; cancelled items are removed from the queue instead
+PERSISTED_STATES = {
+    QUEUED: 'queued',
+    FETCHING: 'downloading',
+    DOWNLOADING: 'downloading',
+    POSTPROCESSING: 'converting',
+    PAUSED: 'paused',
+    DONE: 'completed',
+    FAILED: 'failed',
+}
+
+# Per-item choices for parallel fragment requests; "default" follows the global setting
+FRAGMENT_OPTIONS = {
+    "default": "Default",
+    "auto": "Adaptive",
+    "1": "1",
+    "2": "2",
+    "4": "4",
+    "8": "8",
+    "16": "16",
+}
+
+# Finished items stay in the live queue until this many newer ones finished; older ones move to the history
+HISTORY_LIVE_LIMIT = 20
+
+# Unfinished downloads are written to a hidden folder inside the download folder, on the same
+# filesystem, and renamed into place only once the final file is complete
+STAGING_DIR_NAME = ".streamsaver-staging"
+
+# Playlist entries are added to the queue in batches to keep UI refreshes cheap
+PLAYLIST_BATCH_SIZE = 25
+PLAYLIST_BATCH_INTERVAL = 0.5  # Seconds before a partial batch is flushed anyway
+
+
+class DownloadPaused(DownloadCancelled):
+    """Raised from a progress hook to stop a transfer while keeping its .part file"""
+    msg = "The download was paused"
+
+
+class DownloadStopped(DownloadCancelled):
+    """Raised from a progress hook to abort a transfer whose item was removed"""
+    msg = "The download was cancelled"
+
 
 class ModernYouTubeDownloader:
     def __init__(self, page: ft.Page):
         self.page = page
         self.video_queue = []
+        self.queue_registry = QueueRegistry()  # O(1) lookups by item id for the progress hot path
         self.current_video_info = None
         self.countdown_timer = None
         self.countdown_value = 3
-        self.active_downloads = {}  # Track active downloads by queue item ID
+        self.download_states = DownloadStates()  # Lifecycle of every active download, changed atomically
+        self.download_states.add_listener(self.on_download_state)
         self.update_lock = Lock()  # Add lock for thread-safe updates
         self.is_closing = False    # Flag to track if the app is closing
+        self.ui_dirty = Event()  # Set when controls changed since the last page update
+        self.dirty_controls = {}  # id(control) -> control to redraw in the next frame
+        self.full_update_pending = False  # Whole page needs a diff in the next frame
+        self.circuit_breaker = CircuitBreaker()  # Holds back hosts that keep throttling or failing
+        self.scheduler = DownloadScheduler(circuit_breaker=self.circuit_breaker)  # Caps concurrent downloads across the app
+        self.retry_policy = RetryPolicy()  # Backoff for transient download errors
+        self.disk_guard = DiskSpaceGuard()  # Admits downloads only while their volume has room
+        self.fragment_tuner = FragmentTuner()  # Learns how many HLS/DASH fragments each host serves well in parallel
+        self.fragment_concurrency = "auto"  # Fragments fetched in parallel: a fixed count or "auto" for the tuner
+        self.segmented_connections = DEFAULT_CONNECTIONS  # Range requests per plain HTTP file; 0 leaves it to yt-dlp
+        self.bandwidth_limiter = BandwidthLimiter()  # Shared bandwidth budget, unlimited by default
+        self.transcode_pool = TranscodePool()  # ffmpeg conversions run here, off the network workers
+        self.ydl_pool = YoutubeDLPool(self.scheduler.max_concurrent)  # Warm yt-dlp instances shared by fetches and downloads
+        self.archive = DownloadArchive()  # Finished downloads, checked before anything is queued again
+        self.queue_store = QueueStore()  # Survives restarts so interrupted downloads can resume
+        self.history_store = HistoryStore()  # Finished items compacted out of the live queue
+        self.keep_partial_files = False  # Leave .part files of removed downloads on disk
+        self.finished_items = OrderedDict()  # item_id -> error of finished items still in the live queue, oldest first
+        self.finished_lock = Lock()
         
         # Pagination variables
         self.current_search_term = ""
@@ -78,10 +183,16 @@ class ModernYouTubeDownloader:
         # Initialize torrent panel
         self.torrent_panel = TorrentPanel(page, self.handle_settings_action)
         
+        # Initialize history panel
+        self.history_panel = HistoryPanel(page, self.history_store, self.handle_settings_action)
+        
         self.setup_page()
         self.init_controls()
         self.build_ui()
         
+        # Single writer for page updates, however many downloads report progress
+        Thread(target=self.render_loop, daemon=True).start()
+        
         # Add tab-like UI elements for switching between URL and Search
         self.display_url_mode()
         
@@ -91,6 +202,9 @@ class ModernYouTubeDownloader:
             self.status_text.value = "Warning: ffmpeg not found. Audio conversion features will be limited."
             self.update_ui()
             
+        # Bring back the queue from the previous session
+        self.restore_queue()
+
     def handle_settings_action(self, action_data):
         """Handle settings panel actions"""
         try:
@@ -98,7 +212,7 @@ class ModernYouTubeDownloader:
                 item = action_data.get("item")
                 if item and item.get("type") == "torrent":
                     # Create a unique ID for the queue item
-                    item_id = f"torrent_{len(self.video_queue)}"
+                    item_id = self.queue_registry.new_id("torrent")
                     
                     # Create the queue item container
                     queue_item = self.create_queue_item(
@@ -110,27 +224,73 @@ class ModernYouTubeDownloader:
                     )
                     
                     # Add to queue
-                    self.video_queue.append({
+                    torrent_item = {
                         "id": item_id,
                         "container": queue_item,
                         "type": "torrent",
                         "torrent": item["torrent"],
-                        "status": "queued"
-                    })
+                        "status": "queued",
+                        "state": "queued",
+                    }
+                    self.video_queue.append(torrent_item)
+                    self.queue_registry.add_item(torrent_item)
+                    self.download_states.transition(item_id, QUEUED)
                     
-                    # Add to queue list
-                    self.queue_list.controls.append(queue_item)
+                    # Add to queue list; torrent rows carry live file lists, so they stay built
+                    self.queue_view.add(item_id, queue_item)
+                    self.queue_view.refresh()
                     self.update_ui()
                     
-                    # Start download if it's the only item
-                    if len(self.video_queue) == 1:
-                        self.start_next_download()
+                    # Let the scheduler start it as soon as a slot is free
+                    self.scheduler.submit(
+                        item_id,
+                        lambda: self.start_torrent_download(item_id, queue_item),
+                        priority=item["torrent"].priority,
+                    )
             
             elif action_data.get("type") == "status":
                 # Update status message
                 self.status_text.value = action_data.get("message", "")
                 self.update_ui()
                 
+            elif action_data.get("type") == "update_controls":
+                # Panels redraw their own controls through the render loop
+                self.update_control(*action_data.get("value", ()))
+            
+            elif action_data.get("type") == "open_history_folder":
+                # Show the file of a download from the history
+                item = action_data.get("value", {}).get("item", {})
+                self.open_folder(item.get('download_path'), item.get('output_file'))
+            
+            elif action_data.get("type") == "requeue_history":
+                # Download an item from the history again
+                self.requeue_history_item(action_data.get("value"))
+            
+            elif action_data.get("type") == "set_keep_partial_files":
+                # What happens to the partial files of a download that is removed mid-transfer
+                self.keep_partial_files = bool(action_data.get("value"))
+            
+            elif action_data.get("type") == "set_max_concurrent":
+                # Resize the download worker pool
+                self.scheduler.set_max_concurrent(action_data.get("value", 1))
+                self.ydl_pool.set_max_idle(action_data.get("value", 1))
+            
+            elif action_data.get("type") == "set_fragment_concurrency":
+                # Parallel fragment requests for HLS/DASH downloads that do not set their own
+                self.fragment_concurrency = action_data.get("value", "auto")
+            
+            elif action_data.get("type") == "set_segmented_connections":
+                # Parallel range requests for single-file HTTP downloads (0 = yt-dlp's own downloader)
+                self.segmented_connections = action_data.get("value", 0)
+            
+            elif action_data.get("type") == "set_bandwidth_limit":
+                # Total cap in bytes per second shared by all downloads (0 = unlimited)
+                self.bandwidth_limiter.set_rate(action_data.get("value", 0))
+            
+            elif action_data.get("type") == "set_bandwidth_schedule":
+                # (start_hour, end_hour) during which the cap applies, or None for always
+                self.bandwidth_limiter.set_active_hours(action_data.get("value"))
+        
         except Exception as e:
             print(f"Error handling action: {str(e)}")
             self.status_text.value = f"Error: {str(e)}"
@@ -436,6 +596,26 @@ class ModernYouTubeDownloader:
             visible=False,
         )
 
+        # Priority for scheduling and bandwidth sharing
+        self.priority_dropdown = ft.Dropdown(
+            label="Priority",
+            options=[
+                ft.dropdown.Option("High", "High"),
+                ft.dropdown.Option("Normal", "Normal"),
+                ft.dropdown.Option("Low", "Low"),
+            ],
+            value="Normal",
+            border_radius=8,
+            border_color="#333333",
+            focused_border_color="#ff0000",
+            bgcolor="#1f1f1f",
+            color="white",
+            content_padding=10,
+            text_size=14,
+            disabled=True,
+            width=170,
+        )
+        
         # Download path selection
         self.download_path = ft.TextField(
             label="Save to folder",
@@ -567,11 +747,23 @@ class ModernYouTubeDownloader:
         )
 
         # Queue list
-        self.queue_list = ft.ListView(
-            spacing=5,
-            padding=10,
-            expand=True,
-            auto_scroll=True,
+        # Only rows near the viewport get controls; the rest is rebuilt from the item model on scroll
+        self.queue_view = VirtualQueueView(
+            self.build_queue_row,
+            self.get_queue_item_state,
+            on_change=self.update_control,
+        )
+        self.queue_list = self.queue_view.list_view
+        
+        # Status filter for the queue list
+        self.queue_filter = ft.Dropdown(
+            value="All",
+            options=[ft.dropdown.Option(name) for name in STATUS_FILTERS],
+            on_change=lambda e: self.queue_view.set_filter(e.control.value),
+            width=130,
+            text_size=12,
+            content_padding=ft.padding.symmetric(horizontal=8),
+            border_color="#333333",
         )
 
         # Footer with attribution
@@ -612,6 +804,8 @@ class ModernYouTubeDownloader:
                                 icon_size=24,
                                 on_click=self.toggle_torrent_panel,
                             ),
+                            # Download history button
+                            self.history_panel.get_history_button(),
                             # Settings button if available
                             self.settings_panel.get_settings_button() if self.settings_panel else ft.Container(width=0),
                         ],
@@ -709,6 +903,7 @@ class ModernYouTubeDownloader:
                                         self.download_type,
                                         self.video_quality,
                                         self.audio_quality,
+                                        self.priority_dropdown,
                                     ],
                                     alignment=ft.MainAxisAlignment.START,
                                     spacing=10,
@@ -778,6 +973,7 @@ class ModernYouTubeDownloader:
                                 weight=ft.FontWeight.BOLD,
                                 color="white",
                             ),
+                            self.queue_filter,
                             self.queue_count,
                         ],
                         alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
@@ -851,6 +1047,7 @@ class ModernYouTubeDownloader:
         # Add settings panel to page overlay if available
         if self.settings_panel:
             self.page.overlay.append(self.settings_panel.get_settings_panel())
+        self.page.overlay.append(self.history_panel.get_history_panel())
 
     def validate_url(self, e=None):
         url = self.url_input.value
@@ -861,7 +1058,7 @@ class ModernYouTubeDownloader:
         # URL validation pattern
         url_pattern = r'^(https?:\/\/)?(www\.)?(youtube\.com|youtu\.be|vimeo\.com|dailymotion\.com|twitch\.tv).*'
         
-        if re.match(url_pattern, url):
+        if re.match(url_pattern, url) or re.match(DIRECT_MEDIA_PATTERN, url, re.IGNORECASE):
             # Show spinner with countdown
             self.spinner_row.visible = True
             self.status_text.value = "Preparing to fetch video information..."
@@ -901,6 +1098,7 @@ class ModernYouTubeDownloader:
         self.video_quality.visible = False
         self.audio_quality.disabled = True
         self.audio_quality.visible = False
+        self.priority_dropdown.disabled = True
         self.browse_button.disabled = True
         self.download_button.disabled = True
         self.queue_button.disabled = True
@@ -923,12 +1121,18 @@ class ModernYouTubeDownloader:
                 'no_warnings': True,
                 'skip_download': True,
                 'ignoreerrors': False,
+                'extract_flat': 'in_playlist',  # Playlist entries stay flat until they are downloaded
             }
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            with self.ydl_pool.lease(ydl_opts) as ydl:
+                # Unprocessed first, so a playlist or channel is not enumerated here
+                info = ydl.extract_info(url, download=False, process=False)
+                if info and info.get('_type') not in ('playlist', 'multi_video'):
+                    info = ydl.process_ie_result(info, download=False)
                 
-                if info:
+                if info and info.get('_type') in ('playlist', 'multi_video'):
+                    self.show_playlist_info(url, info)
+                elif info:
                     # Store video info for later use
                     self.current_video_info = {
                         'id': info.get('id', ''),
@@ -937,8 +1141,12 @@ class ModernYouTubeDownloader:
                         'duration': info.get('duration', 0),
                         'thumbnail': info.get('thumbnail', ''),
                         'url': url,
+                        'extractor_key': info.get('extractor_key', 'Generic'),
                         'formats': info.get('formats', []),
-                        'ext': info.get('ext', 'mp4')
+                        'ext': info.get('ext', 'mp4'),
+                        # Full info dict so downloads can skip a second extraction
+                        'info': info,
+                        'fetched_at': time.time(),
                     }
                     
                     # Update UI with video information in a thread-safe manner
@@ -963,6 +1171,152 @@ class ModernYouTubeDownloader:
             print(traceback.format_exc())
             self.show_error(f"Error fetching video information: {str(e)}")
 
+    def show_playlist_info(self, url, info):
+        """Show a playlist or channel; its entries are only enumerated when it is queued"""
+        entry_count = info.get('playlist_count')
+        self.current_video_info = {
+            'id': info.get('id', ''),
+            'title': info.get('title', 'Unknown Playlist'),
+            'uploader': info.get('uploader') or info.get('channel') or 'Unknown Uploader',
+            'duration': 0,
+            'thumbnail': self.get_thumbnail_url(info),
+            'url': url,
+            'is_playlist': True,
+            'entry_count': entry_count,
+        }
+        
+        self.update_video_info(
+            self.current_video_info['title'],
+            self.current_video_info['uploader'],
+            "",
+            self.current_video_info['thumbnail'],
+        )
+        self.video_length.value = f"Playlist: {entry_count} entries" if entry_count else "Playlist"
+        self.status_text.value = "Playlist loaded. Entries are added to the queue as they are found"
+        self.enable_download_options()
+
+    def get_thumbnail_url(self, info):
+        """Thumbnail of a full or flat info dict; flat entries only carry a thumbnails list"""
+        if info.get('thumbnail'):
+            return info['thumbnail']
+        thumbnails = [t for t in info.get('thumbnails') or [] if t.get('url')]
+        return thumbnails[-1]['url'] if thumbnails else ""
+
+    def ingest_playlist(self, url, download_type, quality, download_path, priority, start=False):
+        """Stream a playlist's entries into the queue while it is still being enumerated"""
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'skip_download': True,
+            'ignoreerrors': True,  # Skip private or deleted entries
+            'extract_flat': 'in_playlist',
+        }
+        
+        added = 0
+        skipped = 0
+        try:
+            with self.ydl_pool.lease(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False, process=False)
+                batch = []
+                last_flush = time.time()
+                
+                # Entries are generated page by page, so the first batch is queued before the rest is known
+                for entry in self.iter_playlist_entries(info):
+                    if self.is_closing:
+                        return
+                    queue_item = self.make_playlist_queue_item(entry, download_type, quality, download_path, priority)
+                    if self.reuse_archived_download(queue_item['video_info'], download_type, quality, download_path):
+                        skipped += 1
+                        continue
+                    batch.append(queue_item)
+                    
+                    if len(batch) >= PLAYLIST_BATCH_SIZE or time.time() - last_flush >= PLAYLIST_BATCH_INTERVAL:
+                        self.add_queue_items(batch, start)
+                        added += len(batch)
+                        batch = []
+                        last_flush = time.time()
+                        self.update_status(f"Adding playlist entries... {added} queued")
+                
+                if batch:
+                    self.add_queue_items(batch, start)
+                    added += len(batch)
+            
+            message = f"Added {added} playlist entries to the queue"
+            if skipped:
+                message += f", skipped {skipped} already downloaded"
+            self.update_status(message)
+        except Exception as e:
+            print(f"Error reading playlist: {str(e)}")
+            print(traceback.format_exc())
+            self.update_status(f"Playlist error after {added} entries: {str(e)}")
+
+    def iter_playlist_entries(self, info):
+        """Yield the video entries of a flat playlist result, descending into nested playlists"""
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue
+            if entry.get('_type') in ('playlist', 'multi_video'):
+                yield from self.iter_playlist_entries(entry)
+            else:
+                yield entry
+
+    def make_playlist_queue_item(self, entry, download_type, quality, download_path, priority):
+        """Queue item for a flat playlist entry; the full info is extracted when it downloads"""
+        video_info = {
+            'id': entry.get('id', ''),
+            'title': entry.get('title') or entry.get('id') or 'Unknown Title',
+            'uploader': entry.get('uploader') or entry.get('channel') or 'Unknown Uploader',
+            'duration': entry.get('duration') or 0,
+            'thumbnail': self.get_thumbnail_url(entry),
+            'url': entry.get('webpage_url') or entry.get('url'),
+            'extractor_key': entry.get('ie_key') or 'Generic',
+            'formats': [],
+            'ext': 'mp4',
+        }
+        return {
+            'video_info': video_info,
+            'download_type': download_type,
+            'quality': quality,
+            'download_path': download_path,
+            'priority': priority,
+            'status': 'queued',
+            'progress': 0,
+            'id': self.queue_registry.new_id("queue"),
+        }
+
+    def add_queue_items(self, queue_items, start=False):
+        """Append several items to the queue with a single UI refresh"""
+        self.queue_store.add(queue_items)
+        for queue_item in queue_items:
+            self.video_queue.append(queue_item)
+            self.queue_registry.add_item(queue_item)
+            self.add_item_to_queue_ui(queue_item, update=False)
+            if start:
+                self.start_queue_item_download(queue_item['id'])
+        
+        self.queue_view.refresh()
+        self.queue_count.value = f"Queue: {len(self.video_queue)} items"
+        self.update_control(self.queue_count)
+
+    def load_full_video_info(self, video_info):
+        """Extract the full info dict for a queue item that only has flat playlist metadata"""
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'skip_download': True,
+        }
+        with self.ydl_pool.lease(ydl_opts) as ydl:
+            info = ydl.extract_info(video_info['url'], download=False)
+        
+        video_info.update({
+            'title': info.get('title', video_info['title']),
+            'duration': info.get('duration', video_info['duration']),
+            'formats': info.get('formats', []),
+            'ext': info.get('ext', 'mp4'),
+            'info': info,
+            'fetched_at': time.time(),
+        })
+
     def update_video_info(self, title, author, length, thumbnail_url):
         """Update UI with video information in a thread-safe manner"""
         try:
@@ -1015,6 +1369,7 @@ class ModernYouTubeDownloader:
             self.video_quality.visible = False
             self.video_quality.disabled = True
             
+        self.priority_dropdown.disabled = False
         self.download_button.disabled = False
         self.queue_button.disabled = False
         self.update_ui()
@@ -1043,42 +1398,163 @@ class ModernYouTubeDownloader:
             self.update_ui()
             return
             
+        if self.current_video_info.get('is_playlist'):
+            self.queue_playlist()
+            return
+        
+        # Don't fetch the same video in the same format twice
+        existing_file = self.reuse_archived_download(
+            self.current_video_info,
+            self.download_type.value,
+            self.get_selected_quality(),
+            self.download_path.value,
+        )
+        if existing_file:
+            self.url_input.value = ""
+            self.reset_video_info()
+            self.update_status(f"Already downloaded: {existing_file}")
+            return
+        
         # Prepare queue item data
         queue_item = {
             'video_info': self.current_video_info,
             'download_type': self.download_type.value,
             'quality': self.get_selected_quality(),
             'download_path': self.download_path.value,
+            'priority': self.priority_dropdown.value or "Normal",
             'status': 'queued',
             'progress': 0,
-            'id': f"queue_{len(self.video_queue)}_{int(time.time())}"
+            'id': self.queue_registry.new_id("queue"),
         }
         
         # Add to queue
         self.video_queue.append(queue_item)
+        self.queue_registry.add_item(queue_item)
+        self.queue_store.add([queue_item])
         
         # Update queue UI
         self.add_item_to_queue_ui(queue_item)
         
         # Update queue count
         self.queue_count.value = f"Queue: {len(self.video_queue)} items"
-        self.update_ui()
+        self.update_control(self.queue_count)
         
         # Show notification
         self.status_text.value = "Added to download queue"
-        self.update_ui()
+        self.update_control(self.status_text)
         
         # Reset for next video
         self.url_input.value = ""
         self.reset_video_info()
 
+    def queue_playlist(self, start=False):
+        """Add every entry of the loaded playlist to the queue in the background"""
+        Thread(
+            target=self.ingest_playlist,
+            args=(
+                self.current_video_info['url'],
+                self.download_type.value,
+                self.get_selected_quality(),
+                self.download_path.value,
+                self.priority_dropdown.value or "Normal",
+                start,
+            ),
+            daemon=True,
+        ).start()
+        
+        # Reset for the next URL; progress is reported in the status line
+        self.url_input.value = ""
+        self.reset_video_info()
+        self.update_status("Adding playlist entries...")
+
+    def restore_queue(self):
+        """Re-create the queue saved by the previous session and resume what was in flight"""
+        try:
+            saved_items = self.queue_store.load()
+            # History records keep their queue ids; new items must not overwrite them
+            last_history_id = self.history_store.last_id()
+        except Exception as e:
+            print(f"Error loading saved queue: {str(e)}")
+            return
+        
+        if last_history_id:
+            self.queue_registry.reserve(last_history_id)
+        
+        for queue_item, state in saved_items:
+            item_id = queue_item['id']
+            self.queue_registry.reserve(item_id)
+            self.video_queue.append(queue_item)
+            self.queue_registry.add_item(queue_item)
+            queue_item['state'] = state
+            self.add_item_to_queue_ui(queue_item, update=False)
+            
+            if state in ('queued', 'downloading', 'converting'):
+                # Interrupted mid-transfer; the saved filename_base leads yt-dlp back to its staged .part file
+                self.start_queue_item_download(item_id)
+            elif state == 'paused':
+                # Route through the normal pause path so the Resume button works
+                self.download_states.transition(item_id, QUEUED)
+                self.pause_queue_item_download(item_id)
+            elif state == 'completed':
+                # Finished in an earlier session; it never becomes active again
+                self.show_completed_item(item_id, queue_item.get('output_file'))
+            elif state == 'failed':
+                self.set_row_state(item_id, status="Failed", status_color="#F44336")
+                self.retire_queue_item(item_id)
+        
+        if saved_items:
+            self.queue_view.refresh()
+            self.queue_count.value = f"Queue: {len(self.video_queue)} items"
+            self.update_status(f"Restored {len(saved_items)} queue items from the last session")
+
+    def get_archive_key(self, video_info, download_type, quality):
+        """(extractor, video id, format) identifying a download in the archive, or None"""
+        if not video_info.get('id'):
+            return None
+        return video_info.get('extractor_key', 'Generic'), video_info['id'], f"{download_type}:{quality}"
+
+    def archive_download(self, video_info, download_type, quality, file_path):
+        key = self.get_archive_key(video_info, download_type, quality)
+        if key and file_path:
+            self.archive.record(*key, os.path.abspath(file_path))
+
+    def reuse_archived_download(self, video_info, download_type, quality, download_path):
+        """Return the file of an earlier identical download, hard-linked into download_path when possible"""
+        key = self.get_archive_key(video_info, download_type, quality)
+        existing_file = key and self.archive.lookup(*key)
+        if not existing_file:
+            return None
+        
+        target = os.path.join(download_path, os.path.basename(existing_file))
+        if os.path.abspath(target) == existing_file or os.path.exists(target):
+            return target
+        try:
+            os.link(existing_file, target)
+            return target
+        except OSError:
+            # Different filesystem or no link support; the earlier copy still counts
+            return existing_file
+
     def get_selected_quality(self):
         if self.download_type.value == "video":
             return self.video_quality.value or "best"
         else:
             return self.audio_quality.value or "best"
 
-    def add_item_to_queue_ui(self, queue_item):
+    def add_item_to_queue_ui(self, queue_item, update=True):
+        """Add a video item to the queue list; its row control is built when it scrolls into view"""
+        # Row appearance lives in the item model so a row can be rebuilt after scrolling out of view
+        queue_item['view'] = dict(QUEUE_ROW_DEFAULTS, progress_color=self.generate_random_color())
+        queue_item.setdefault('state', 'pending')
+        
+        self.queue_view.add(queue_item['id'])
+        if update:
+            self.queue_view.refresh()
+
+    def build_queue_row(self, item_id):
+        """Create the controls of a video queue row from its item model"""
+        queue_item = self.get_queue_item_by_id(item_id)
+        
         # Create progress bar for this item
         progress_bar = ft.ProgressBar(
             width=None,  # Full width
@@ -1103,8 +1579,8 @@ class ModernYouTubeDownloader:
             border_radius=ft.border_radius.all(4),
         )
         
-        # Generate a unique color for this item's progress bar
-        progress_color = self.generate_random_color()
+        # Each item keeps the progress bar color it was given when queued
+        progress_color = queue_item['view']['progress_color']
         progress_bar.color = progress_color
         
         # Download button for this item
@@ -1155,6 +1631,14 @@ class ModernYouTubeDownloader:
             on_click=lambda e, id=queue_item['id']: self.toggle_item_details(id),
         )
         
+        # Audio bitrate actually used, filled in once the source stream is known
+        audio_text = ft.Text(
+            value="",
+            size=12,
+            color="#bbbbbb",
+            visible=False,
+        )
+        
         # Details section (initially collapsed)
         details_section = ft.Container(
             content=ft.Column(
@@ -1174,6 +1658,32 @@ class ModernYouTubeDownloader:
                         size=12,
                         color="#bbbbbb",
                     ),
+                    audio_text,
+                    ft.Row(
+                        [
+                            ft.Dropdown(
+                                label="Priority",
+                                value=queue_item.get('priority', "Normal"),
+                                options=[
+                                    ft.dropdown.Option("Normal"),
+                                    ft.dropdown.Option("High"),
+                                    ft.dropdown.Option("Low"),
+                                ],
+                                on_change=lambda e, id=queue_item['id']: self.update_video_priority(id, e.control.value),
+                                width=100,
+                                text_size=12,
+                            ),
+                            ft.Dropdown(
+                                label="Fragments",
+                                value=queue_item.get('fragments', "default"),
+                                options=[ft.dropdown.Option(key, label) for key, label in FRAGMENT_OPTIONS.items()],
+                                on_change=lambda e, id=queue_item['id']: self.update_video_fragments(id, e.control.value),
+                                width=120,
+                                text_size=12,
+                            ),
+                        ],
+                        spacing=10,
+                    ),
                 ],
                 spacing=2,
             ),
@@ -1260,41 +1770,84 @@ class ModernYouTubeDownloader:
                 "delete_button": delete_button,
                 "expand_button": expand_button,
                 "details_section": details_section,
+                "audio_text": audio_text,
                 "progress_color": progress_color,
                 "is_expanded": False,
                 "download_path": queue_item['download_path'],
-                "output_file": None,  # Will store the output file path when download completes
+                "output_file": queue_item.get('output_file'),  # Set once the download completes
             },
         )
         
-        self.queue_list.controls.append(item)
-        self.update_ui()
+        self.apply_row_state(item, queue_item['view'])
+        return item
+
+    def apply_row_state(self, container, view):
+        """Copy an item's row state onto its controls"""
+        container.data["status_text"].value = view['status']
+        container.data["status_container"].bgcolor = view['status_color']
+        container.data["progress_bar"].value = view['progress'] / 100
+        container.data["progress_bar"].color = "#FF9800" if view['paused'] else view['progress_color']
+        container.data["download_button"].disabled = not view['download_enabled']
+        
+        pause_button = container.data["pause_button"]
+        pause_button.disabled = not view['pause_enabled']
+        pause_button.icon = ft.Icons.PLAY_ARROW if view['paused'] else ft.Icons.PAUSE
+        pause_button.tooltip = "Resume" if view['paused'] else "Pause"
+        container.data["folder_button"].disabled = not view['folder_enabled']
+        
+        audio_text = container.data["audio_text"]
+        audio_text.value = view['audio']
+        audio_text.visible = bool(view['audio'])
+        
+        expand_button = container.data["expand_button"]
+        container.data["details_section"].visible = view['expanded']
+        container.data["is_expanded"] = view['expanded']
+        expand_button.icon = ft.Icons.EXPAND_LESS if view['expanded'] else ft.Icons.EXPAND_MORE
+        expand_button.tooltip = "Collapse details" if view['expanded'] else "Expand details"
+
+    def set_row_state(self, item_id, **changes):
+        """Update a video row's model and, if the row is currently built, its controls"""
+        queue_item = self.get_queue_item_by_id(item_id)
+        if not queue_item or 'view' not in queue_item:
+            return
+        queue_item['view'].update(changes)
         
-    def toggle_item_details(self, item_id):
-        # Find the UI container
         container = self.get_queue_control_by_id(item_id)
-        if not container:
+        if container:
+            self.apply_row_state(container, queue_item['view'])
+            self.update_control(container)
+
+    def set_queue_item_state(self, item_id, state):
+        """Persist a queue item's state and re-apply the status filter"""
+        queue_item = self.get_queue_item_by_id(item_id)
+        if queue_item:
+            queue_item['state'] = state
+        self.queue_store.set_state(item_id, state)
+        self.queue_view.state_changed(item_id)
+
+    def on_download_state(self, item_id, old_state, new_state):
+        """Save each download state change with the queue item"""
+        # Only transfers and conversions hold disk space reservations
+        if new_state not in (DOWNLOADING, POSTPROCESSING):
+            self.disk_guard.release(item_id)
+        
+        persisted = PERSISTED_STATES.get(new_state)
+        # Transfers torn down by closing the app stay resumable
+        if persisted is None or (new_state == FAILED and self.is_closing):
+            return
+        self.set_queue_item_state(item_id, persisted)
+
+    def get_queue_item_state(self, item_id):
+        queue_item = self.get_queue_item_by_id(item_id)
+        return queue_item.get('state', 'pending') if queue_item else None
+
+    def toggle_item_details(self, item_id):
+        queue_item = self.get_queue_item_by_id(item_id)
+        if not queue_item:
             return
             
-        # Get data elements
-        details_section = container.data["details_section"]
-        expand_button = container.data["expand_button"]
-        is_expanded = container.data["is_expanded"]
-        
         # Toggle expanded state
-        if is_expanded:
-            details_section.visible = False
-            expand_button.icon = ft.Icons.EXPAND_MORE
-            expand_button.tooltip = "Expand details"
-            container.data["is_expanded"] = False
-        else:
-            details_section.visible = True
-            expand_button.icon = ft.Icons.EXPAND_LESS
-            expand_button.tooltip = "Collapse details"
-            container.data["is_expanded"] = True
-            
-        # Update UI
-        self.update_ui()
+        self.set_row_state(item_id, expanded=not queue_item['view']['expanded'])
 
     def generate_random_color(self):
         """Generate a random color for progress bars to differentiate queue items"""
@@ -1323,25 +1876,89 @@ class ModernYouTubeDownloader:
         return download_type
 
     def remove_from_queue(self, item_id):
-        # Remove from active downloads if it's being downloaded
-        if item_id in self.active_downloads:
-            self.active_downloads[item_id]['status'] = 'cancelled'
+        # Drop it from the scheduler if it is still waiting for a slot
+        self.scheduler.cancel(item_id)
+        
+        # Stop it wherever it is; a running transfer aborts at its next progress tick
+        state = self.download_states.get(item_id)
+        queue_item = self.get_queue_item_by_id(item_id)
+        if state and self.download_states.transition(item_id, CANCELLED, expected=(state,)) and queue_item:
+            self.cancel_download(queue_item, state)
+        
+        # A torrent's own thread keeps pulling from peers until it is stopped
+        if queue_item and queue_item.get('type') == "torrent":
+            queue_item['torrent'].stop()
+        
+        with self.finished_lock:
+            self.finished_items.pop(item_id, None)
         
         # Remove from queue list
-        for i, item in enumerate(self.video_queue):
-            if item['id'] == item_id:
-                self.video_queue.pop(i)
-                break
+        queue_item = self.queue_registry.remove(item_id)
+        if queue_item:
+            self.video_queue.remove(queue_item)
+        self.queue_store.remove(item_id)
                 
         # Remove from UI
-        for i, control in enumerate(self.queue_list.controls):
-            if control.key == item_id:
-                self.queue_list.controls.pop(i)
-                break
+        self.queue_view.remove(item_id)
+        self.queue_view.refresh(force=True)
                 
         # Update queue count
         self.queue_count.value = f"Queue: {len(self.video_queue)} items"
-        self.update_ui()
+        self.update_control(self.queue_count)
+
+    def cancel_download(self, queue_item, state):
+        """Release a cancelled item's bandwidth and CPU at once and clean up files no worker is writing"""
+        item_id = queue_item['id']
+        # Wake a transfer that is sleeping in the bandwidth limiter so it sees the cancellation
+        self.bandwidth_limiter.unregister(item_id)
+        if state == POSTPROCESSING:
+            self.transcode_pool.cancel(item_id)
+        
+        # A transfer in progress deletes its own files once yt-dlp has closed them
+        if state in (QUEUED, PAUSED, POSTPROCESSING):
+            self.discard_partial_files(queue_item)
+
+    def discard_partial_files(self, queue_item):
+        """Delete the files of an unfinished download unless partial files are kept"""
+        filename_base = queue_item.get('filename_base')
+        if self.keep_partial_files or not filename_base:
+            return
+        # .part and .ytdl files, fragments and unconverted sources all live in the item's staging folder
+        self.discard_staging_dir(self.get_staging_dir(queue_item['download_path'], filename_base, queue_item['id']))
+
+    def retire_queue_item(self, item_id, error=None):
+        """Note a finished item and move the oldest finished ones out of the live queue"""
+        with self.finished_lock:
+            self.finished_items[item_id] = error
+            self.finished_items.move_to_end(item_id)
+            expired = []
+            while len(self.finished_items) > HISTORY_LIVE_LIMIT:
+                expired.append(self.finished_items.popitem(last=False))
+        
+        for old_id, old_error in expired:
+            self.move_to_history(old_id, old_error)
+
+    def move_to_history(self, item_id, error=None):
+        """Compact a finished item into the history store and drop its row and model"""
+        queue_item = self.get_queue_item_by_id(item_id)
+        if not queue_item:
+            return
+        self.history_store.add(queue_item, self.get_queue_item_state(item_id), error)
+        self.remove_from_queue(item_id)
+
+    def requeue_history_item(self, record):
+        """Add a download from the history back to the queue and start it"""
+        queue_item = dict(record['item'])
+        # A fresh id and filename so the new download does not collide with the old files
+        for key in ('output_file', 'filename_base', 'state', 'attempts'):
+            queue_item.pop(key, None)
+        queue_item.update({
+            'id': self.queue_registry.new_id("queue"),
+            'status': 'queued',
+            'progress': 0,
+        })
+        self.add_queue_items([queue_item], start=True)
+        self.update_status(f"Queued again: {record['title']}")
 
     def start_download(self, e):
         if not self.url_input.value or not self.download_type.value or not self.current_video_info:
@@ -1349,6 +1966,23 @@ class ModernYouTubeDownloader:
             self.update_ui()
             return
             
+        # A playlist is downloaded by queueing its entries and starting them as they arrive
+        if self.current_video_info.get('is_playlist'):
+            self.queue_playlist(start=True)
+            return
+        
+        # An earlier download of the same video and format is reused instead of fetched again
+        existing_file = self.reuse_archived_download(
+            self.current_video_info,
+            self.download_type.value,
+            self.get_selected_quality(),
+            self.download_path.value,
+        )
+        if existing_file:
+            self.update_status(f"Already downloaded: {existing_file}")
+            self.show_folder_option(existing_file)
+            return
+        
         # Disable UI during download
         self.disable_ui_during_download()
         
@@ -1357,13 +1991,17 @@ class ModernYouTubeDownloader:
         quality = self.get_selected_quality()
         download_path = self.download_path.value
         
-        # Start download in a separate thread
-        Thread(target=self.download_media, args=(
-            self.current_video_info,
-            download_type,
-            quality,
-            download_path
-        )).start()
+        # Run the download on the shared worker pool; direct downloads jump ahead of the queue
+        item_id = f"direct_{int(time.time() * 1000)}"
+        video_info = self.current_video_info
+        priority = self.priority_dropdown.value or "Normal"
+        self.scheduler.submit(
+            item_id,
+            lambda: self.download_media(item_id, video_info, download_type, quality, download_path, priority),
+            priority="High",
+        )
+        if self.scheduler.is_queued(item_id):
+            self.update_status("Waiting for a free download slot...")
 
     def disable_ui_during_download(self):
         self.url_input.disabled = True
@@ -1371,6 +2009,7 @@ class ModernYouTubeDownloader:
         self.download_type.disabled = True
         self.video_quality.disabled = True
         self.audio_quality.disabled = True
+        self.priority_dropdown.disabled = True
         self.browse_button.disabled = True
         self.download_button.disabled = True
         self.queue_button.disabled = True
@@ -1386,170 +2025,344 @@ class ModernYouTubeDownloader:
             self.video_quality.disabled = False
         else:
             self.audio_quality.disabled = False
+        self.priority_dropdown.disabled = False
         self.browse_button.disabled = False
         self.download_button.disabled = False
         self.queue_button.disabled = False
         self.update_ui()
 
-    def download_media(self, video_info, download_type, quality, download_path):
+    def download_media(self, item_id, video_info, download_type, quality, download_path, priority="Normal"):
+        # Share the bandwidth budget like any queue item; item_id keeps concurrent direct downloads apart
+        self.bandwidth_limiter.register(item_id, priority)
+        staging_dir = None
+        converting = False
+        
         try:
-            url = video_info['url']
-            
             # Update status
             self.update_status("Starting download...")
             
-            # Create unique filename base
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename_base = f"{video_info['title'].replace(' ', '_')}_{timestamp}"
-            
-            # Sanitize filename to remove invalid characters
-            filename_base = re.sub(r'[\\/*?:"<>|]', "", filename_base)
+            # Build options for the requested format
+            filename_base = self.make_filename_base(video_info['title'])
+            staging_dir = self.get_staging_dir(download_path, filename_base, item_id)
+            output_template = os.path.join(staging_dir, f"{filename_base}.%(ext)s")
+            selection = self.select_formats(video_info, download_type, quality)
+            fragments, _ = self.get_fragment_concurrency(None, self.get_host_key(video_info))
+            ydl_opts = self.build_ydl_opts(
+                download_type,
+                quality,
+                output_template,
+                lambda d: self.yt_dlp_progress_hook(d, item_id),
+                selection,
+                fragments,
+            )
+            # The free space check needs the folder to exist; yt-dlp would only create it later
+            os.makedirs(download_path, exist_ok=True)
+            self.disk_guard.reserve(item_id, download_path, self.estimate_download_size(video_info, download_type, quality, selection))
             
             if download_type == "video":
-                # Download video using YT-DLP
-                output_template = os.path.join(download_path, f"{filename_base}.%(ext)s")
-                
-                ydl_opts = {
-                    'format': self.get_video_format_string(quality),
-                    'outtmpl': output_template,
-                    'progress_hooks': [self.yt_dlp_progress_hook],
-                    'quiet': True,
-                }
-                
-                # If ffmpeg is not available, adjust format to avoid merging
-                if not self.has_ffmpeg:
-                    ydl_opts['format'] = f'best[height<={self.get_height_for_quality(quality)}]'
-                
-                self.update_status(f"Downloading video in {quality} quality...")
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
-                    
-                # Get the actual output filename from the info dict
-                info_dict = ydl.extract_info(url, download=False)
-                output_file = ydl.prepare_filename(info_dict)
-                    
-                    # Update status on completion
-                self.download_complete(output_file)
-                
+                self.update_status(f"Downloading video in {self.describe_selection(quality, selection)} quality...")
+            elif not self.has_ffmpeg:
+                self.update_status("Downloading audio (ffmpeg not available, no conversion)...")
             elif download_type == "audio":
-                # Download audio as MP3 using YT-DLP
-                output_template = os.path.join(download_path, f"{filename_base}.%(ext)s")
-                
-                if self.has_ffmpeg:
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'outtmpl': output_template,
-                        'postprocessors': [{
-                            'key': 'FFmpegExtractAudio',
-                            'preferredcodec': 'mp3',
-                            'preferredquality': self.get_audio_quality_string(quality),
-                        }],
-                        'progress_hooks': [self.yt_dlp_progress_hook],
-                        'quiet': True,
-                    }
-                    
-                    self.update_status(f"Downloading and converting to MP3 ({quality} quality)...")
-                    
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        ydl.download([url])
-                        
-                    # The output file will have .mp3 extension
-                    output_file = os.path.join(download_path, f"{filename_base}.mp3")
-                    
-                    # Update status on completion
-                    self.download_complete(output_file)
-                else:
-                    # Without ffmpeg, just download the best audio
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'outtmpl': output_template,
-                        'progress_hooks': [self.yt_dlp_progress_hook],
-                        'quiet': True,
-                    }
-                    
-                    self.update_status(f"Downloading audio (ffmpeg not available, no conversion)...")
-                    
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        ydl.download([url])
-                        
-                    # Get the actual output filename
-                    info_dict = ydl.extract_info(url, download=False)
-                    output_file = ydl.prepare_filename(info_dict)
-                    
-                    # Update status on completion
-                    self.download_complete(output_file)
-                
-            else:  # audio_hq
-                # Download high quality audio (m4a) using YT-DLP
-                output_template = os.path.join(download_path, f"{filename_base}.%(ext)s")
+                self.update_status(f"Downloading and converting to MP3 ({quality} quality)...")
+            else:
+                self.update_status(f"Downloading high quality audio ({quality})...")
+            
+            output_file, downloaded_format = self.run_ydl_download(ydl_opts, video_info)
+            
+            if self.needs_transcode(download_type):
+                codec, bitrate, action = self.plan_audio_job(download_type, quality, downloaded_format)
+            else:
+                action = "keep"
                 
-                if self.has_ffmpeg:
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'outtmpl': output_template,
-                        'postprocessors': [{
-                            'key': 'FFmpegExtractAudio',
-                            'preferredcodec': 'm4a',
-                            'preferredquality': self.get_audio_quality_string(quality),
-                        }],
-                        'progress_hooks': [self.yt_dlp_progress_hook],
-                        'quiet': True,
-                    }
-                    
-                    self.update_status(f"Downloading high quality audio ({quality})...")
-                    
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        ydl.download([url])
-                        
-                    # The output file will have .m4a extension
-                    output_file = os.path.join(download_path, f"{filename_base}.m4a")
-                    
-                    # Update status on completion
-                    self.download_complete(output_file)
-                else:
-                    # Without ffmpeg, just download the best audio
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'outtmpl': output_template,
-                        'progress_hooks': [self.yt_dlp_progress_hook],
-                        'quiet': True,
-                    }
-                    
-                    self.update_status(f"Downloading audio (ffmpeg not available, no conversion)...")
-                    
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        ydl.download([url])
-                        
-                    # Get the actual output filename
-                    info_dict = ydl.extract_info(url, download=False)
-                    output_file = ydl.prepare_filename(info_dict)
-                    
-                    # Update status on completion
-                    self.download_complete(output_file)
+            if action != "keep":
+                # Release the network slot; the conversion finishes on the transcode pool
+                def on_converted(converted_file, error):
+                    try:
+                        if error:
+                            raise error
+                        converted_file = self.publish_download(converted_file, download_path)
+                    except Exception as e:
+                        self.show_error(f"Conversion error: {str(e)}")
+                        self.discard_staging_dir(staging_dir)
+                        return
+                    finally:
+                        # The converted copy is written; its space no longer needs holding
+                        self.disk_guard.release(item_id)
+                    self.archive_download(video_info, download_type, quality, converted_file)
+                    self.download_complete(converted_file)
+                
+                verb = "Remuxing" if action == "copy" else "Converting"
+                self.update_status(f"Download finished. Waiting to convert... {self.describe_audio_job(codec, bitrate, action, downloaded_format)}")
+                self.transcode_pool.submit(
+                    item_id,
+                    output_file,
+                    codec,
+                    bitrate,
+                    copy=action == "copy",
+                    on_start=lambda: self.update_status(f"{verb} to {codec.upper()}..."),
+                    on_done=on_converted,
+                )
+                converting = True
+                return
+            
+            # Update status on completion
+            output_file = self.publish_download(output_file, download_path)
+            self.archive_download(video_info, download_type, quality, output_file)
+            self.download_complete(output_file)
                 
         except Exception as e:
             # Handle any exceptions
             self.show_error(f"Download error: {str(e)}")
+            if staging_dir:
+                self.discard_staging_dir(staging_dir)
+        
+        finally:
+            self.bandwidth_limiter.unregister(item_id)
+            # A queued conversion still writes its copy into the reserved space; on_converted releases it
+            if not converting:
+                self.disk_guard.release(item_id)
 
-    def get_video_format_string(self, quality):
-        if quality == "best":
-            return "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"
-        elif quality == "1080p":
-            return "bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best"
-        elif quality == "720p":
-            return "bestvideo[height<=720][ext=mp4]+bestaudio[ext=m4a]/best[height<=720][ext=mp4]/best"
-        elif quality == "480p":
-            return "bestvideo[height<=480][ext=mp4]+bestaudio[ext=m4a]/best[height<=480][ext=mp4]/best"
-        elif quality == "360p":
-            return "bestvideo[height<=360][ext=mp4]+bestaudio[ext=m4a]/best[height<=360][ext=mp4]/best"
-        elif quality == "240p":
-            return "bestvideo[height<=240][ext=mp4]+bestaudio[ext=m4a]/best[height<=240][ext=mp4]/best"
-        elif quality == "144p":
-            return "bestvideo[height<=144][ext=mp4]+bestaudio[ext=m4a]/best[height<=144][ext=mp4]/best"
+    def estimate_download_size(self, video_info, download_type, quality, selection=None):
+        """Bytes a download is expected to write, including a merged or converted copy, or None when unknown"""
+        if download_type == "video":
+            size = selection['filesize'] if selection else None
         else:
-            return "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"
+            # yt-dlp takes the best audio stream; the largest known one bounds it
+            sizes = [get_format_size(f) for f in video_info.get('formats') or [] if f.get('vcodec') == "none"]
+            size = max((s for s in sizes if s), default=None)
+        
+        if not size:
+            # Single-file sources report their size on the info dict itself
+            info = video_info.get('info') or {}
+            size = info.get('filesize') or info.get('filesize_approx')
+        
+        if size and download_type == "video" and selection and selection['needs_merge']:
+            # The merge stream-copies both sources into a new file before deleting them
+            size *= 2
+        
+        if size and self.needs_transcode(download_type) and video_info.get('duration'):
+            # The converted file is written next to the source before the source is deleted
+            size += int(self.get_audio_quality_string(quality)) * 1000 // 8 * int(video_info['duration'])
+        return size
+
+    def get_partial_size(self, staging_dir):
+        """Bytes already on disk from an interrupted download staged in staging_dir"""
+        pattern = os.path.join(glob.escape(staging_dir), "*")
+        return sum(os.path.getsize(path) for path in glob.glob(pattern))
+
+    def get_staging_dir(self, download_path, filename_base, owner):
+        """Folder for a download's .part files, fragments and unconverted sources.
+        
+        A title and a second are not unique on their own (the same video queued as video
+        and as audio), so the id of the owning item is part of the folder name.
+        """
+        return os.path.join(download_path, STAGING_DIR_NAME, f"{filename_base}.{owner}")
+
+    def publish_download(self, staged_file, download_path):
+        """Atomically move a finished file out of its staging folder into download_path"""
+        final_path = os.path.join(download_path, os.path.basename(staged_file))
+        # Same filesystem, so this is a rename; the folder never shows a half-written file
+        os.replace(staged_file, final_path)
+        self.discard_staging_dir(os.path.dirname(staged_file))
+        return final_path
+
+    def discard_staging_dir(self, staging_dir):
+        """Delete a staging folder with whatever is left in it"""
+        # The shared parent stays, since another download may be creating its folder in it right now
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def make_filename_base(self, title):
+        """Create a unique, filesystem-safe filename base from a video title"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename_base = f"{title.replace(' ', '_')}_{timestamp}"
+        
+        # Sanitize filename to remove invalid characters
+        return re.sub(r'[\\/*?:"<>|]', "", filename_base)
+
+    def select_formats(self, video_info, download_type, quality):
+        """Choose exact video format ids from the fetched formats list, or None to use a generic selector"""
+        if download_type != "video":
+            return None
+        return select_video_formats(video_info.get('formats'), quality, can_merge=self.has_ffmpeg)
+
+    def describe_selection(self, quality, selection):
+        """Quality label for status messages, with the expected size when it is known"""
+        if not selection:
+            return quality
+        label = f"{selection['height']}p"
+        if selection['filesize']:
+            label += f", {self.format_size(selection['filesize'])}"
+        return label
+
+    def build_ydl_opts(self, download_type, quality, output_template, progress_hook, selection=None, fragments=1):
+        """Build yt-dlp options for a download type and quality"""
+        ydl_opts = {
+            'outtmpl': output_template,
+            'progress_hooks': [progress_hook],
+            'quiet': True,
+            'continuedl': True,  # Resume .part files left by a pause
+            'concurrent_fragment_downloads': fragments,  # Only HLS/DASH fragment downloads use this
+        }
+        
+        if download_type == "video":
+            ydl_opts['format'] = get_format_string(quality)
+            
+            # If ffmpeg is not available, adjust format to avoid merging
+            if not self.has_ffmpeg:
+                ydl_opts['format'] = get_fallback_format_string(quality)
             
+            # Exact ids picked from the cached formats; the selector only applies if they vanished since the fetch
+            if selection:
+                ydl_opts['format'] = f"{selection['format_id']}/{ydl_opts['format']}"
+        elif download_type == "audio_hq":
+            # AAC audio is stored as M4A by a stream copy or kept as is; other codecs are re-encoded later
+            ydl_opts['format'] = 'bestaudio[ext=m4a]/bestaudio/best'
+        else:
+            # Audio (MP3); the conversion runs later on the transcode pool
+            ydl_opts['format'] = 'bestaudio/best'
+        
+        return ydl_opts
+
+    def get_fragment_concurrency(self, setting, host_key):
+        """Return (fragments, adaptive): the parallel fragment count for a download and whether the tuner chose it"""
+        # Items without their own setting follow the global one
+        if setting in (None, "default"):
+            setting = self.fragment_concurrency
+        if setting == "auto":
+            return self.fragment_tuner.get_level(host_key), True
+        return int(setting), False
+
+    def record_fragment_throughput(self, host_key, fragments, streams, elapsed):
+        """Report a finished download's throughput to the fragment tuner"""
+        # Plain HTTP ignores the fragment setting, and our own bandwidth cap says nothing about the host
+        if elapsed <= 0 or self.bandwidth_limiter.is_limited():
+            return
+        if not any(s['info_dict'].get('protocol') in FRAGMENTED_PROTOCOLS for s in streams.values()):
+            return
+        downloaded = sum(s.get('downloaded_bytes') or 0 for s in streams.values())
+        self.fragment_tuner.record_throughput(host_key, fragments, downloaded / elapsed)
+
+    def needs_transcode(self, download_type):
+        """Audio downloads are converted with ffmpeg when it is available"""
+        return self.has_ffmpeg and download_type in ("audio", "audio_hq")
+
+    def get_audio_codec(self, download_type):
+        """Target container for an audio download type"""
+        return "mp3" if download_type == "audio" else "m4a"
+
+    def plan_audio_job(self, download_type, quality, downloaded_format):
+        """Return (codec, bitrate, action) for a finished audio download; see plan_audio_conversion"""
+        codec = self.get_audio_codec(download_type)
+        # Never encode above the bitrate of the stream that was downloaded
+        bitrate = cap_audio_bitrate(self.get_audio_quality_string(quality), get_source_bitrate(downloaded_format))
+        return codec, bitrate, plan_audio_conversion(downloaded_format, codec, bitrate)
+
+    def describe_audio_job(self, codec, bitrate, action, downloaded_format):
+        """Human readable summary of the audio conversion chosen for a download"""
+        source_codec = (downloaded_format.get('acodec') or "unknown").split('.')[0]
+        source_bitrate = get_source_bitrate(downloaded_format)
+        source = f"{source_codec} {source_bitrate:.0f} kbps" if source_bitrate else source_codec
+        
+        if action == "encode":
+            return f"Audio: {codec.upper()} {bitrate} kbps (source {source})"
+        return f"Audio: original {source} stream, no re-encode"
+
+    def run_ydl_download(self, ydl_opts, video_info):
+        """Download from the info dict captured at fetch time; returns the final file path and the format used"""
+        # yt-dlp reports the path after every post-processing step; the last one is the file on disk
+        final_path = {}
+        def record_filepath(d):
+            if d['status'] == 'finished' and d['info_dict'].get('filepath'):
+                final_path['filepath'] = d['info_dict']['filepath']
+        ydl_opts = dict(ydl_opts, postprocessor_hooks=[record_filepath])
+        
+        with self.ydl_pool.lease(ydl_opts) as ydl:
+            if self.has_fresh_info(video_info):
+                # Reuse the fetched metadata; sanitizing drops the previous format selection
+                info = ydl.sanitize_info(video_info['info'], remove_private_keys=True)
+            else:
+                # Missing or expired metadata needs exactly one fresh extraction
+                info = ydl.extract_info(video_info['url'], download=False, process=False)
+            
+            # Select the format first; a single plain HTTP file can go to the segmented downloader
+            resolved = ydl.process_ie_result(info, download=False)
+            fixup_policy = ydl.params.get('fixup')
+            if supports_segmented_download(resolved):
+                filepath = ydl.prepare_filename(resolved)
+                if self.segmented_connections and self.run_segmented_download(ydl, resolved, filepath):
+                    # yt-dlp now finds the finished file and only runs its fixups (e.g. remuxing DASH m4a),
+                    # which it otherwise skips for files it did not download itself
+                    ydl.params['fixup'] = 'force'
+                else:
+                    # yt-dlp would resume a preallocated .part as if it were written front to back
+                    discard_segmented_part(filepath)
+            
+            info = ydl.process_ie_result(ydl.sanitize_info(resolved, remove_private_keys=True), download=True)
+            ydl.params['fixup'] = fixup_policy
+            requested = info.get('requested_downloads') or [info]
+            return final_path.get('filepath') or requested[0]['filepath'], requested[0]
+
+    def run_segmented_download(self, ydl, fmt, filepath):
+        """Fetch a resolved single-file format over parallel range requests; False if the server cannot serve ranges"""
+        headers = dict(fmt.get('http_headers') or {})
+        cookies = ydl.cookiejar.get_cookie_header(fmt['url'])
+        if cookies:
+            headers['Cookie'] = cookies
+        
+        downloader = SegmentedDownloader(
+            fmt['url'],
+            filepath,
+            headers=headers,
+            connections=self.segmented_connections,
+            progress_hooks=ydl._progress_hooks,
+            info_dict=fmt,
+        )
+        return downloader.download()
+
+    def has_fresh_info(self, video_info):
+        """True if the info dict captured at fetch time still has usable stream URLs"""
+        return bool(video_info.get('info')) and time.time() - video_info.get('fetched_at', 0) < VIDEO_INFO_MAX_AGE
+
+    def download_streams(self, ydl_opts, video_info, selection, stream_template):
+        """Fetch the video and audio formats of a merged selection side by side.
+        
+        Each stream runs on its own leased YoutubeDL and reports progress under its own
+        filename; video_info must hold fresh info so both share one extraction. Returns
+        the (video_file, audio_file) paths; if either stream fails the other stops at its
+        next progress tick and the first error is raised.
+        """
+        stopped = Event()
+        results = {}
+        errors = []
+        
+        def stop_if_sibling_failed(d):
+            if stopped.is_set():
+                raise DownloadCancelled("The other stream of this download failed")
+        
+        def fetch(format_id):
+            stream_opts = dict(
+                ydl_opts,
+                format=format_id,
+                outtmpl=stream_template,
+                progress_hooks=[stop_if_sibling_failed] + ydl_opts['progress_hooks'],
+            )
+            try:
+                results[format_id] = self.run_ydl_download(stream_opts, video_info)[0]
+            except BaseException as e:
+                errors.append(e)
+                stopped.set()
+        
+        video_format, audio_format = selection['format_id'].split("+")
+        audio_worker = Thread(target=fetch, args=(audio_format,), daemon=True)
+        audio_worker.start()
+        fetch(video_format)
+        audio_worker.join()
+        
+        if errors:
+            raise errors[0]
+        return results[video_format], results[audio_format]
+
     def get_audio_quality_string(self, quality):
         if quality == "best":
             return "320"
@@ -1562,8 +2375,12 @@ class ModernYouTubeDownloader:
         else:
             return "192"
     
-    def yt_dlp_progress_hook(self, d):
+    def yt_dlp_progress_hook(self, d, item_id):
         if d['status'] == 'downloading':
+            # Throttle to the direct download's share of the bandwidth budget
+            self.bandwidth_limiter.record_progress(item_id, d.get('filename'), d.get('downloaded_bytes') or 0)
+            self.disk_guard.record_progress(item_id, d.get('filename'), d.get('allocated_bytes') or d.get('downloaded_bytes') or 0)
+            
             # Get download percentage
             if 'total_bytes' in d and d['total_bytes'] > 0:
                 percentage = d['downloaded_bytes'] / d['total_bytes']
@@ -1588,11 +2405,11 @@ class ModernYouTubeDownloader:
 
     def update_progress(self, percentage):
         self.progress_bar.value = percentage / 100  # Progress bar expects value between 0 and 1
-        self.update_ui()
+        self.update_control(self.progress_bar)
 
     def update_status(self, message):
         self.status_text.value = message
-        self.update_ui()
+        self.update_control(self.status_text)
 
     def download_complete(self, file_path):
         # Show completion status
@@ -1767,7 +2584,7 @@ class ModernYouTubeDownloader:
             
         # Update UI only if app is still running
         if not self.is_closing:
-            self.update_ui()
+            self.update_control(self.search_results_container, self.pagination_row, self.status_text)
             
     def load_next_page(self, e=None):
         """Load the next page of search results"""
@@ -1907,7 +2724,7 @@ class ModernYouTubeDownloader:
                 result_container.bgcolor = "#2a2a2a"
             else:
                 result_container.bgcolor = "#1a1a1a"
-            self.update_ui()
+            self.update_control(result_container)
             
         result_container.on_hover = on_hover
         
@@ -1925,36 +2742,12 @@ class ModernYouTubeDownloader:
         # Validate the URL to get video info
         self.validate_url()
 
-    def get_height_for_quality(self, quality):
-        """Convert quality string to height value"""
-        if quality == "best":
-            return 1080  # Default to 1080p for best
-        elif quality == "1080p":
-            return 1080
-        elif quality == "720p":
-            return 720
-        elif quality == "480p":
-            return 480
-        elif quality == "360p":
-            return 360
-        elif quality == "240p":
-            return 240
-        elif quality == "144p":
-            return 144
-        else:
-            return 720  # Default to 720p
-
     def get_queue_item_by_id(self, item_id):
-        for item in self.video_queue:
-            if item['id'] == item_id:
-                return item
-        return None
+        return self.queue_registry.get_item(item_id)
 
     def get_queue_control_by_id(self, item_id):
-        for control in self.queue_list.controls:
-            if control.key == item_id:
-                return control
-        return None
+        """Row control of an item, or None while it is scrolled out of view"""
+        return self.queue_view.get_control(item_id)
 
     def start_queue_item_download(self, item_id):
         # Find the queue item
@@ -1962,37 +2755,43 @@ class ModernYouTubeDownloader:
         if not queue_item:
             return
             
-        # Get the UI container
-        container = self.get_queue_control_by_id(item_id)
-        if not container:
+        # Items that are already waiting or running are left alone
+        if not self.download_states.transition(item_id, QUEUED):
             return
-            
-        # Update UI to show downloading status
-        status_text = container.data["status_text"]
-        status_container = container.data["status_container"]
-        progress_bar = container.data["progress_bar"]
-        download_button = container.data["download_button"]
-        pause_button = container.data["pause_button"]
-        
-        # Update button states
-        download_button.disabled = True
-        pause_button.disabled = False
-        
-        # Update status
-        status_text.value = "Downloading..."
-        status_container.bgcolor = "#1976D2"  # Blue for downloading
-        
-        # Create a new download thread
-        self.active_downloads[item_id] = {
-            'status': 'downloading',
-            'progress': 0,
-        }
         
-        # Update UI
-        self.update_ui()
+        # A failed item started again is no longer finished, and gets its full set of retries back
+        with self.finished_lock:
+            self.finished_items.pop(item_id, None)
+        queue_item['attempts'] = 0
+        
+        # Grey while waiting for a slot
+        self.set_row_state(
+            item_id,
+            status="Waiting...",
+            status_color="#757575",
+            download_enabled=False,
+            pause_enabled=True,
+        )
         
-        # Start download in a thread
-        Thread(target=self.download_queue_item, args=(queue_item, container)).start()
+        # Hand the item to the scheduler; it starts when a download slot is free
+        self.submit_queue_item(queue_item)
+
+    def submit_queue_item(self, queue_item, delay=0):
+        """Schedule a queue item's download, grouped by host for the circuit breaker"""
+        self.scheduler.submit(
+            queue_item['id'],
+            lambda: self.download_queue_item(queue_item),
+            priority=queue_item.get('priority', "Normal"),
+            key=self.get_host_key(queue_item['video_info']),
+            delay=delay,
+        )
+
+    def get_host_key(self, video_info):
+        """Extractor name, or the host name for generic URLs; failures are counted per key"""
+        extractor = video_info.get('extractor_key')
+        if extractor and extractor != 'Generic':
+            return extractor
+        return urllib.parse.urlparse(video_info.get('url') or "").hostname or 'Generic'
 
     def pause_queue_item_download(self, item_id):
         # Find the queue item
@@ -2000,397 +2799,353 @@ class ModernYouTubeDownloader:
         if not queue_item:
             return
             
-        # Get the UI container
-        container = self.get_queue_control_by_id(item_id)
-        if not container:
-            return
-            
         # Toggle pause/resume
-        if item_id in self.active_downloads:
-            if self.active_downloads[item_id]['status'] == 'downloading':
-                # Pause download
-                self.active_downloads[item_id]['status'] = 'paused'
-                
-                # Update UI
-                status_text = container.data["status_text"]
-                status_container = container.data["status_container"]
-                pause_button = container.data["pause_button"]
-                progress_bar = container.data["progress_bar"]
-                progress_color = container.data["progress_color"]
-                
-                # Change progress bar color for paused state
-                progress_bar.color = "#FF9800"  # Orange for paused
-                
-                status_text.value = "Paused"
-                status_container.bgcolor = "#FF9800"  # Orange for paused
-                pause_button.icon = ft.Icons.PLAY_ARROW
-                pause_button.tooltip = "Resume"
-                
-                self.update_ui()
-            elif self.active_downloads[item_id]['status'] == 'paused':
-                # Resume download
-                self.active_downloads[item_id]['status'] = 'downloading'
-                
-                # Update UI
-                status_text = container.data["status_text"]
-                status_container = container.data["status_container"]
-                pause_button = container.data["pause_button"]
-                progress_bar = container.data["progress_bar"]
-                progress_color = container.data["progress_color"]
-                
-                # Restore original progress bar color
-                progress_bar.color = progress_color
-                
-                status_text.value = "Downloading..."
-                status_container.bgcolor = "#1976D2"  # Blue for downloading
-                pause_button.icon = ft.Icons.PAUSE
-                pause_button.tooltip = "Pause"
-                
-                self.update_ui()
-
-    def download_queue_item(self, queue_item, container):
-        # Get UI elements
-        progress_bar = container.data["progress_bar"]
-        status_text = container.data["status_text"]
-        status_container = container.data["status_container"]
-        download_button = container.data["download_button"]
-        pause_button = container.data["pause_button"]
+        state = self.download_states.get(item_id)
+        if state in (QUEUED, FETCHING, DOWNLOADING):
+            # Pause download; a running transfer aborts on its next progress tick
+            # and keeps its .part file, freeing the slot and bandwidth for other items
+            if self.download_states.transition(item_id, PAUSED, expected=(state,)):
+                self.scheduler.cancel(item_id)
+                
+                # Release a transfer that is currently sleeping in the bandwidth limiter
+                self.bandwidth_limiter.unregister(item_id)
+                
+                # Orange progress bar and status, play icon on the pause button
+                self.set_row_state(item_id, paused=True, status="Paused", status_color="#FF9800")
+        elif state == PAUSED:
+            # Resume download; yt-dlp continues the .part file with a range request
+            if self.download_states.transition(item_id, QUEUED, expected=(PAUSED,)):
+                queue_item['attempts'] = 0
+                # Restore the original progress bar color
+                self.set_row_state(item_id, paused=False, status="Resuming...", status_color="#1976D2")
+                
+                self.submit_queue_item(queue_item)
+
+    def download_queue_item(self, queue_item):
+        item_id = queue_item['id']
+        
+        # Skip items that were removed or paused while waiting for a slot
+        needs_info = not self.has_fresh_info(queue_item['video_info'])
+        if not self.download_states.transition(item_id, FETCHING if needs_info else DOWNLOADING, expected=(QUEUED,)):
+            return
+        self.set_row_state(item_id, download_enabled=False, pause_enabled=True)
+        
+        # Share the bandwidth budget according to the item's priority
+        self.bandwidth_limiter.register(item_id, queue_item.get('priority', "Normal"))
         
         try:
             # Get parameters
-            url = queue_item['video_info']['url']
             download_type = queue_item['download_type']
             quality = queue_item['quality']
             download_path = queue_item['download_path']
-            item_id = queue_item['id']
-            
-            # Create unique filename base
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename_base = f"{queue_item['video_info']['title'].replace(' ', '_')}_{timestamp}"
             
-            # Sanitize filename to remove invalid characters
-            filename_base = re.sub(r'[\\/*?:"<>|]', "", filename_base)
+            # Playlist entries only carry flat metadata and cached stream URLs expire; resolve formats once, right before downloading
+            if needs_info:
+                self.update_queue_item_status(item_id, "Fetching video information...", "#1976D2")
+                self.load_full_video_info(queue_item['video_info'])
+                # Paused or removed while the info was being extracted
+                if not self.download_states.transition(item_id, DOWNLOADING, expected=(FETCHING,)):
+                    self.raise_if_interrupted(item_id)
             
             # Update status
             self.update_queue_item_status(item_id, "Starting download...", "#1976D2")
             
-            output_file = None
+            # Build options for the requested format; the filename is kept so a resume finds its .part file
+            if not queue_item.get('filename_base'):
+                queue_item['filename_base'] = self.make_filename_base(queue_item['video_info']['title'])
+                self.queue_store.save(queue_item)
+            filename_base = queue_item['filename_base']
+            staging_dir = self.get_staging_dir(download_path, filename_base, item_id)
+            output_template = os.path.join(staging_dir, f"{filename_base}.%(ext)s")
+            selection = self.select_formats(queue_item['video_info'], download_type, quality)
+            streams = {}  # filename -> latest progress of each stream, summed for the row
+            host_key = self.get_host_key(queue_item['video_info'])
+            fragments, adaptive = self.get_fragment_concurrency(queue_item.get('fragments'), host_key)
+            ydl_opts = self.build_ydl_opts(
+                download_type,
+                quality,
+                output_template,
+                lambda d: self.queue_progress_hook(d, item_id, streams),
+                selection,
+                fragments,
+            )
+            
+            # Fail now rather than at 95% when the volume cannot take the file
+            os.makedirs(download_path, exist_ok=True)
+            partial_size = self.get_partial_size(staging_dir)
+            self.disk_guard.reserve(
+                item_id,
+                download_path,
+                self.estimate_download_size(queue_item['video_info'], download_type, quality, selection),
+                partial_size,
+            )
             
             if download_type == "video":
-                # Download video
-                output_template = os.path.join(download_path, f"{filename_base}.%(ext)s")
-                
-                ydl_opts = {
-                    'format': self.get_video_format_string(quality),
-                    'outtmpl': output_template,
-                    'progress_hooks': [lambda d: self.queue_progress_hook(d, item_id)],
-                    'quiet': True,
-                }
-                
-                # If ffmpeg is not available, adjust format to avoid merging
-                if not self.has_ffmpeg:
-                    ydl_opts['format'] = f'best[height<={self.get_height_for_quality(quality)}]'
-                
-                self.update_queue_item_status(item_id, f"Downloading video ({quality})...", "#1976D2")
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    # Check if download was cancelled during setup
-                    if item_id in self.active_downloads and self.active_downloads[item_id]['status'] == 'cancelled':
-                        return
-                        
-                    # Get info to determine output file
-                    info_dict = ydl.extract_info(url, download=False)
-                    temp_output_file = ydl.prepare_filename(info_dict)
-                        
-                    # Start the download
-                    ydl.download([url])
-                    
-                    # Check if download was cancelled during download
-                    if item_id in self.active_downloads and self.active_downloads[item_id]['status'] == 'cancelled':
-                        return
-                    
-                    # Determine the actual output file (it might have changed extension)
-                    possible_extensions = ['mp4', 'webm', 'mkv']
-                    for ext in possible_extensions:
-                        test_path = os.path.splitext(temp_output_file)[0] + f".{ext}"
-                        if os.path.exists(test_path):
-                            output_file = test_path
-                            break
-                    
-                    if not output_file and os.path.exists(temp_output_file):
-                        output_file = temp_output_file
-                    
-                    # Mark as complete
-                    self.complete_queue_item(item_id, os.path.basename(output_file) if output_file else "Unknown file", output_file)
-                
+                self.update_queue_item_status(item_id, f"Downloading video ({self.describe_selection(quality, selection)})...", "#1976D2")
+            elif not self.has_ffmpeg:
+                self.update_queue_item_status(item_id, "Downloading audio (no conversion)...", "#1976D2")
             elif download_type == "audio":
-                # Audio (MP3)
-                output_template = os.path.join(download_path, f"{filename_base}.%(ext)s")
-                
-                if self.has_ffmpeg:
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'outtmpl': output_template,
-                        'postprocessors': [{
-                            'key': 'FFmpegExtractAudio',
-                            'preferredcodec': 'mp3',
-                            'preferredquality': self.get_audio_quality_string(quality),
-                        }],
-                        'progress_hooks': [lambda d: self.queue_progress_hook(d, item_id)],
-                        'quiet': True,
-                    }
-                    
-                    self.update_queue_item_status(item_id, f"Downloading MP3 ({quality})...", "#1976D2")
-                    
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        # Check if download was cancelled
-                        if item_id in self.active_downloads and self.active_downloads[item_id]['status'] == 'cancelled':
-                            return
-                        
-                        # Get info to determine output file
-                        info_dict = ydl.extract_info(url, download=False)
-                        temp_output_file = ydl.prepare_filename(info_dict)
-                            
-                        # Start the download
-                        ydl.download([url])
-                        
-                        # Check if download was cancelled during download
-                        if item_id in self.active_downloads and self.active_downloads[item_id]['status'] == 'cancelled':
-                            return
-                        
-                        # The output file will have .mp3 extension
-                        output_file = os.path.splitext(temp_output_file)[0] + ".mp3"
-                        
-                        # Mark as complete
-                        self.complete_queue_item(item_id, os.path.basename(output_file) if os.path.exists(output_file) else "Unknown file", output_file)
-                else:
-                    # Without ffmpeg, just download the best audio
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'outtmpl': output_template,
-                        'progress_hooks': [lambda d: self.queue_progress_hook(d, item_id)],
-                        'quiet': True,
-                    }
-                    
-                    self.update_queue_item_status(item_id, "Downloading audio (no conversion)...", "#1976D2")
-                    
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        # Check if download was cancelled
-                        if item_id in self.active_downloads and self.active_downloads[item_id]['status'] == 'cancelled':
-                            return
-                        
-                        # Get info to determine output file
-                        info_dict = ydl.extract_info(url, download=False)
-                        output_file = ydl.prepare_filename(info_dict)
-                            
-                        # Start the download
-                        ydl.download([url])
-                        
-                        # Check if download was cancelled during download
-                        if item_id in self.active_downloads and self.active_downloads[item_id]['status'] == 'cancelled':
-                            return
-                        
-                        # Mark as complete
-                        self.complete_queue_item(item_id, os.path.basename(output_file) if os.path.exists(output_file) else "Unknown file", output_file)
-                
-            else:  # audio_hq
-                # High quality audio (M4A)
-                output_template = os.path.join(download_path, f"{filename_base}.%(ext)s")
-                
-                if self.has_ffmpeg:
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'outtmpl': output_template,
-                        'postprocessors': [{
-                            'key': 'FFmpegExtractAudio',
-                            'preferredcodec': 'm4a',
-                            'preferredquality': self.get_audio_quality_string(quality),
-                        }],
-                        'progress_hooks': [lambda d: self.queue_progress_hook(d, item_id)],
-                        'quiet': True,
-                    }
-                    
-                    self.update_queue_item_status(item_id, f"Downloading HQ audio ({quality})...", "#1976D2")
-                    
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        # Check if download was cancelled
-                        if item_id in self.active_downloads and self.active_downloads[item_id]['status'] == 'cancelled':
-                            return
-                        
-                        # Get info to determine output file
-                        info_dict = ydl.extract_info(url, download=False)
-                        temp_output_file = ydl.prepare_filename(info_dict)
-                            
-                        # Start the download
-                        ydl.download([url])
-                        
-                        # Check if download was cancelled during download
-                        if item_id in self.active_downloads and self.active_downloads[item_id]['status'] == 'cancelled':
-                            return
-                        
-                        # The output file will have .m4a extension
-                        output_file = os.path.splitext(temp_output_file)[0] + ".m4a"
-                        
-                        # Mark as complete
-                        self.complete_queue_item(item_id, os.path.basename(output_file) if os.path.exists(output_file) else "Unknown file", output_file)
-                else:
-                    # Without ffmpeg, just download the best audio
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'outtmpl': output_template,
-                        'progress_hooks': [lambda d: self.queue_progress_hook(d, item_id)],
-                        'quiet': True,
-                    }
-                    
-                    self.update_queue_item_status(item_id, "Downloading audio (no conversion)...", "#1976D2")
-                    
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        # Check if download was cancelled
-                        if item_id in self.active_downloads and self.active_downloads[item_id]['status'] == 'cancelled':
-                            return
-                        
-                        # Get info to determine output file
-                        info_dict = ydl.extract_info(url, download=False)
-                        output_file = ydl.prepare_filename(info_dict)
-                            
-                        # Start the download
-                        ydl.download([url])
-                        
-                        # Check if download was cancelled during download
-                        if item_id in self.active_downloads and self.active_downloads[item_id]['status'] == 'cancelled':
-                            return
-                        
-                        # Mark as complete
-                        self.complete_queue_item(item_id, os.path.basename(output_file) if os.path.exists(output_file) else "Unknown file", output_file)
+                self.update_queue_item_status(item_id, f"Downloading MP3 ({quality})...", "#1976D2")
+            else:
+                self.update_queue_item_status(item_id, f"Downloading HQ audio ({quality})...", "#1976D2")
+                
+            # Check if download was paused or removed during setup
+            self.raise_if_interrupted(item_id)
+            
+            started = time.monotonic()
+            if selection and selection['needs_merge']:
+                # Fetch video and audio concurrently, so a throttled stream does not hold up the other
+                stream_files = self.download_streams(
+                    ydl_opts,
+                    queue_item['video_info'],
+                    selection,
+                    os.path.join(staging_dir, f"{filename_base}.f%(format_id)s.%(ext)s"),
+                )
+            else:
+                output_file, downloaded_format = self.run_ydl_download(ydl_opts, queue_item['video_info'])
+            self.circuit_breaker.record_success(host_key)
+            queue_item['attempts'] = 0
+            # A resumed transfer only measured its remainder
+            if adaptive and not partial_size:
+                self.record_fragment_throughput(host_key, fragments, streams, time.monotonic() - started)
+            
+            # Check if download was paused or removed after its last progress tick
+            self.raise_if_interrupted(item_id)
+            
+            if selection and selection['needs_merge']:
+                merged_file = os.path.join(staging_dir, f"{filename_base}.{selection['ext']}")
+                self.start_postprocessing(
+                    item_id,
+                    "Waiting to merge...",
+                    f"Merging into {selection['ext'].upper()}...",
+                    lambda on_start, on_done: self.transcode_pool.submit_merge(
+                        item_id, *stream_files, merged_file, on_start=on_start, on_done=on_done,
+                    ),
+                )
+                return
                 
-        except Exception as e:
-            # Update with error
-            self.update_queue_item_status(item_id, f"Error: {str(e)}", "#F44336")
+            if self.needs_transcode(download_type):
+                codec, bitrate, action = self.plan_audio_job(download_type, quality, downloaded_format)
+                self.update_queue_item_audio(item_id, self.describe_audio_job(codec, bitrate, action, downloaded_format))
+            else:
+                action = "keep"
+            
+            if action != "keep":
+                verb = "Remuxing" if action == "copy" else "Converting"
+                self.start_postprocessing(
+                    item_id,
+                    "Waiting to convert...",
+                    f"{verb} to {codec.upper()}...",
+                    lambda on_start, on_done: self.transcode_pool.submit(
+                        item_id, output_file, codec, bitrate, copy=action == "copy", on_start=on_start, on_done=on_done,
+                    ),
+                )
+                return
             
-            # Update UI
-            if item_id in self.active_downloads:
-                del self.active_downloads[item_id]
+            # Mark as complete
+            output_file = self.publish_download(output_file, download_path)
+            self.complete_queue_item(item_id, os.path.basename(output_file), output_file)
+        
+        except DownloadPaused:
+            # The transfer stopped at a progress tick; the slot is released and the .part file kept
+            if self.download_states.get(item_id) == PAUSED:
+                self.update_queue_item_status(item_id, "Paused", "#FF9800")
+        
+        except DownloadStopped:
+            # Removed mid-transfer; yt-dlp has closed the .part file, so it can be deleted now
+            self.discard_partial_files(queue_item)
                 
-            download_button.disabled = False
-            pause_button.disabled = True
-            self.update_ui()
+        except Exception as e:
+            # Transient errors are retried after a backoff, anything else fails the item
+            self.retry_or_fail_queue_item(queue_item, e)
+        
+        finally:
+            self.bandwidth_limiter.unregister(item_id)
+
+    def start_postprocessing(self, item_id, waiting_message, running_message, submit):
+        """Hand a downloaded item to the transcode pool, freeing its network slot now.
+        
+        submit(on_start, on_done) queues the ffmpeg job; the item completes or fails
+        through finish_queue_item_conversion.
+        """
+        if not self.download_states.transition(item_id, POSTPROCESSING, expected=(DOWNLOADING,)):
+            self.raise_if_interrupted(item_id)
+        self.set_row_state(item_id, pause_enabled=False)
+        self.update_queue_item_status(item_id, waiting_message, "#7B1FA2")
+        submit(
+            lambda: self.update_queue_item_status(item_id, running_message, "#7B1FA2"),
+            lambda output_file, error: self.finish_queue_item_conversion(item_id, output_file, error),
+        )
 
-    def update_queue_item_status(self, item_id, status_message, color="#1976D2"):
-        # Find the UI container
-        container = self.get_queue_control_by_id(item_id)
-        if not container:
+    def retry_or_fail_queue_item(self, queue_item, error):
+        """Re-queue a download after a transient error, or mark it failed once retries run out"""
+        item_id = queue_item['id']
+        host_key = self.get_host_key(queue_item['video_info'])
+        retryable = is_retryable_error(error)
+        if retryable:
+            # Only throttling and network trouble say something about the host's health
+            self.circuit_breaker.record_failure(host_key)
+        if get_http_status(error) == 429:
+            # Too many parallel fragment requests are a common cause of throttling
+            self.fragment_tuner.record_throttled(host_key)
+        
+        attempt = queue_item.get('attempts', 0) + 1
+        if self.is_closing or not self.retry_policy.should_retry(error, attempt):
+            self.fail_queue_item(item_id, error)
             return
-            
-        # Update status
-        status_text = container.data["status_text"]
-        status_container = container.data["status_container"]
         
-        status_text.value = status_message
-        status_container.bgcolor = color
+        if not self.download_states.transition(item_id, QUEUED, expected=(FETCHING, DOWNLOADING)):
+            return
+        queue_item['attempts'] = attempt
         
-        # Update UI
-        self.update_ui()
+        # Stream URLs may have expired (403), so the next attempt extracts them again
+        for key in ('info', 'fetched_at'):
+            queue_item['video_info'].pop(key, None)
+        
+        delay = self.retry_policy.get_delay(attempt)
+        self.update_queue_item_status(
+            item_id,
+            f"Retrying in {delay:.0f}s (attempt {attempt + 1}/{self.retry_policy.max_attempts})",
+            "#FF9800",
+        )
+        self.submit_queue_item(queue_item, delay=delay)
 
-    def update_queue_item_progress(self, item_id, percentage):
-        # Find the UI container
-        container = self.get_queue_control_by_id(item_id)
-        if not container:
+    def raise_if_interrupted(self, item_id):
+        """Abort the current transfer if its item was paused, re-queued or removed"""
+        state = self.download_states.get(item_id)
+        if state == DOWNLOADING:
             return
-            
-        # Update progress bar
-        progress_bar = container.data["progress_bar"]
-        progress_bar.value = percentage / 100
+        if state in (PAUSED, QUEUED):
+            raise DownloadPaused()
+        raise DownloadStopped()
+
+    def finish_queue_item_conversion(self, item_id, output_file, error):
+        """Complete or fail a queue item once the transcode pool is done with it"""
+        # Removed while it was waiting for or running the conversion
+        if self.download_states.get(item_id) != POSTPROCESSING:
+            return
+        
+        if not error:
+            try:
+                output_file = self.publish_download(output_file, self.get_queue_item_by_id(item_id)['download_path'])
+            except Exception as e:
+                error = e
         
-        # Update data store
-        if item_id in self.active_downloads:
-            self.active_downloads[item_id]['progress'] = percentage
+        if error:
+            self.fail_queue_item(item_id, error)
+        else:
+            self.complete_queue_item(item_id, os.path.basename(output_file), output_file)
+
+    def fail_queue_item(self, item_id, error):
+        """Show an error on a queue item and let the user start it again"""
+        # A removal that won the race leaves the item inactive, so a late failure is ignored
+        if not self.get_queue_item_by_id(item_id) or not self.download_states.transition(
+            item_id, FAILED, expected=(FETCHING, DOWNLOADING, POSTPROCESSING)
+        ):
+            return
         
         # Update UI
-        self.update_ui()
+        self.update_queue_item_status(item_id, f"Error: {str(error)}", "#F44336")
+        self.set_row_state(item_id, download_enabled=True, pause_enabled=False, paused=False)
+        if not self.is_closing:
+            self.retire_queue_item(item_id, error)
+
+    def update_queue_item_status(self, item_id, status_message, color="#1976D2"):
+        self.set_row_state(item_id, status=status_message, status_color=color)
+
+    def update_queue_item_audio(self, item_id, description):
+        # Show the chosen audio bitrate in the details section
+        self.set_row_state(item_id, audio=description)
+
+    def update_queue_item_progress(self, item_id, percentage):
+        self.set_row_state(item_id, progress=percentage)
 
     def complete_queue_item(self, item_id, filename, output_file=None):
         """Mark a queue item as completed and enable folder access"""
-        # Find the UI container
-        container = self.get_queue_control_by_id(item_id)
-        if not container:
+        queue_item = self.get_queue_item_by_id(item_id)
+        if not queue_item:
             return
-            
-        # Update UI elements
-        status_text = container.data["status_text"]
-        status_container = container.data["status_container"]
-        progress_bar = container.data["progress_bar"]
-        download_button = container.data["download_button"]
-        pause_button = container.data["pause_button"]
-        folder_button = container.data["folder_button"]
-        
-        # Set progress to 100%
-        progress_bar.value = 1.0
-        
-        # Update status
-        status_text.value = "Completed"
-        status_container.bgcolor = "#4CAF50"  # Green for completed
-        
-        # Update button states
-        download_button.disabled = True
-        pause_button.disabled = True
-        folder_button.disabled = False
         
+        # A pause or removal that won the race keeps the item from completing
+        if not self.download_states.transition(item_id, DONE, expected=(DOWNLOADING, POSTPROCESSING)):
+            return
+            
         # Save output file path for folder access
         if output_file:
-            container.data["output_file"] = output_file
+            self.archive_download(queue_item['video_info'], queue_item['download_type'], queue_item['quality'], output_file)
+            queue_item['output_file'] = output_file
+            self.queue_store.save(queue_item)
         
-        # Remove from active downloads
-        if item_id in self.active_downloads:
-            del self.active_downloads[item_id]
-        
-        # Update UI
-        self.update_ui()
+        self.show_completed_item(item_id, output_file)
 
-    def queue_progress_hook(self, d, item_id):
-        """Progress hook for queue downloads with improved pause handling"""
+    def show_completed_item(self, item_id, output_file=None):
+        """Show a finished item as completed with folder access"""
+        if output_file:
+            container = self.get_queue_control_by_id(item_id)
+            if container:
+                container.data["output_file"] = output_file
+        
+        # Full progress bar, green status and folder access
+        self.set_row_state(
+            item_id,
+            status="Completed",
+            status_color="#4CAF50",
+            progress=100,
+            paused=False,
+            download_enabled=False,
+            pause_enabled=False,
+            folder_enabled=True,
+        )
+        self.retire_queue_item(item_id)
+
+    def queue_progress_hook(self, d, item_id, streams):
+        """Progress hook for queue downloads; raising here is how a pause or removal stops the transfer.
+        
+        streams collects the latest report of every file the item downloads, so video and
+        audio fetched in parallel show up as one progress bar.
+        """
         # Check if app is closing
         if self.is_closing:
             return
             
-        # Check if download is paused
-        if item_id in self.active_downloads and self.active_downloads[item_id]['status'] == 'paused':
-            # When paused, we'll keep updating the UI but with a "paused" indicator
-            # yt-dlp doesn't have native pause, but this will show the user the download is paused
-            # and the download thread handles the actual slow-down when paused
-            if not self.is_closing:
-                if d['status'] == 'downloading' and 'total_bytes' in d and d['total_bytes'] > 0:
-                    percentage = d['downloaded_bytes'] / d['total_bytes']
-                    # Only update the progress, not the status text (to keep "Paused" visible)
-                    self.update_queue_item_progress(item_id, percentage * 100)
-            # Slow down processing while paused to reduce CPU usage
-            time.sleep(0.5)
-            return
-            
         if d['status'] == 'downloading':
-            # Get download percentage
-            if 'total_bytes' in d and d['total_bytes'] > 0:
-                percentage = d['downloaded_bytes'] / d['total_bytes']
+            # Stop network reads as soon as the item is paused, re-queued by a quick resume or removed
+            self.raise_if_interrupted(item_id)
+            
+            # Block here while the item is over its share of the bandwidth budget
+            self.bandwidth_limiter.record_progress(item_id, d.get('filename'), d.get('downloaded_bytes') or 0)
+            # A preallocated file holds its full size from the start
+            self.disk_guard.record_progress(item_id, d.get('filename'), d.get('allocated_bytes') or d.get('downloaded_bytes') or 0)
+            
+            # A pause or removal may have woken the limiter; stop before reading another block
+            self.raise_if_interrupted(item_id)
+            
+            # Get download percentage across all streams of the item
+            streams[d.get('filename')] = d
+            totals = [s.get('total_bytes') for s in streams.values()]
+            if all(totals):
+                percentage = sum(s.get('downloaded_bytes') or 0 for s in streams.values()) / sum(totals)
                 
                 # Update progress bar
                 self.update_queue_item_progress(item_id, percentage * 100)
                 
-                # Update status with download speed and ETA
-                if 'speed' in d and d['speed']:
-                    speed = self.format_size(d['speed']) + "/s"
-                    eta = d.get('eta', 'N/A')
-                    
-                    if eta != 'N/A':
-                        eta = self.format_duration(eta)
+                # Update status with the combined speed and the ETA of the slowest stream
+                total_speed = sum(s.get('speed') or 0 for s in streams.values() if s['status'] == 'downloading')
+                if total_speed:
+                    speed = self.format_size(total_speed) + "/s"
+                    etas = [s['eta'] for s in streams.values() if s['status'] == 'downloading' and s.get('eta') is not None]
+                    eta = self.format_duration(max(etas)) if etas else 'N/A'
                         
                     status = f"DL: {percentage:.0%} | {speed} | ETA: {eta}"
                     
-                    # Only update if not paused and app is not closing
-                    if (item_id not in self.active_downloads or self.active_downloads[item_id]['status'] != 'paused') and not self.is_closing:
+                    # Only update if app is not closing
+                    if not self.is_closing:
                         self.update_queue_item_status(item_id, status, "#1976D2")
                     
         elif d['status'] == 'finished':
-            # Update status if app is not closing
-            if not self.is_closing:
+            streams[d.get('filename')] = d
+            # Update status once every stream is done, if app is not closing
+            if not self.is_closing and all(s['status'] == 'finished' for s in streams.values()):
                 self.update_queue_item_status(item_id, "Processing...", "#1976D2")
 
     def display_url_mode(self):
@@ -2442,12 +3197,12 @@ class ModernYouTubeDownloader:
         # Switch visibility
         self.display_search_mode()
 
-    def safe_update_ui(self):
-        """Thread-safe method to update UI"""
+    def safe_update_ui(self, *controls):
+        """Thread-safe method to update UI; only the given controls are diffed when any are passed"""
         try:
             if not self.is_closing:
                 with self.update_lock:
-                    self.page.update()
+                    self.page.update(*controls)
         except RuntimeError as e:
             if "Event loop is closed" in str(e):
                 # App is closing, set flag to prevent further updates
@@ -2459,8 +3214,37 @@ class ModernYouTubeDownloader:
             print(f"Error updating UI: {str(e)}")
             
     def update_ui(self):
-        """Wrapper for page.update() that uses the safe method"""
-        self.safe_update_ui()
+        """Schedule a whole-page update; the render loop coalesces calls into one update per frame"""
+        with self.update_lock:
+            self.full_update_pending = True
+        self.ui_dirty.set()
+
+    def update_control(self, *controls):
+        """Schedule an update of just these controls and their subtrees"""
+        with self.update_lock:
+            for control in controls:
+                if control is not None:
+                    self.dirty_controls[id(control)] = control
+        self.ui_dirty.set()
+
+    def render_loop(self):
+        """Flush pending UI changes with one page update, at most every UI_REFRESH_INTERVAL"""
+        while not self.is_closing:
+            self.ui_dirty.wait()
+            with self.update_lock:
+                # Clear before flushing so changes made during the update trigger the next frame
+                self.ui_dirty.clear()
+                full_update = self.full_update_pending
+                controls = list(self.dirty_controls.values())
+                self.full_update_pending = False
+                self.dirty_controls.clear()
+            
+            # Controls that are not on the page yet only get mounted by a full diff
+            if full_update or any(control.page is None for control in controls):
+                self.safe_update_ui()
+            elif controls:
+                self.safe_update_ui(*controls)
+            time.sleep(UI_REFRESH_INTERVAL)
 
     def open_download_folder(self, item_id):
         """Open the folder where downloaded file is stored"""
@@ -2471,9 +3255,14 @@ class ModernYouTubeDownloader:
                 return
                 
             # Get file path information
-            download_path = container.data.get("download_path")
-            output_file = container.data.get("output_file")
-            
+            self.open_folder(container.data.get("download_path"), container.data.get("output_file"))
+        except Exception as e:
+            self.status_text.value = f"Error opening folder: {str(e)}"
+            self.update_ui()
+
+    def open_folder(self, download_path, output_file=None):
+        """Open download_path, selecting output_file where the platform supports it"""
+        try:
             # If we have a specific file, open its folder with the file selected
             if output_file and os.path.exists(output_file):
                 if sys.platform == "win32":
@@ -2913,7 +3702,7 @@ class ModernYouTubeDownloader:
                         container.data["status_text"].value = "No files selected"
                         container.data["status_container"].bgcolor = "#FFA000"
                     
-                    self.update_ui()
+                    self.update_control(container)
         except Exception as e:
             print(f"Error updating queue file selection: {str(e)}")
 
@@ -2944,20 +3733,10 @@ class ModernYouTubeDownloader:
                         container.data["pause_button"].icon = ft.Icons.PLAY_ARROW
                         container.data["status_container"].bgcolor = "#FFA000"
                     
-                    self.update_ui()
+                    self.update_control(container)
             else:
-                # Handle video download pause/resume
-                if item_id in self.active_downloads:
-                    if self.active_downloads[item_id]["status"] == "paused":
-                        self.active_downloads[item_id]["status"] = "downloading"
-                        container.data["pause_button"].icon = ft.Icons.PAUSE
-                        container.data["status_container"].bgcolor = "#1976D2"
-                    else:
-                        self.active_downloads[item_id]["status"] = "paused"
-                        container.data["pause_button"].icon = ft.Icons.PLAY_ARROW
-                        container.data["status_container"].bgcolor = "#FFA000"
-                    
-                    self.update_ui()
+                # Video downloads share the queue item pause/resume logic
+                self.pause_queue_item_download(item_id)
                     
         except Exception as e:
             print(f"Error pausing download: {str(e)}")
@@ -2974,15 +3753,17 @@ class ModernYouTubeDownloader:
                 if torrent:
                     torrent.stop()
             
-            if item_id in self.active_downloads:
-                self.active_downloads[item_id]["status"] = "cancelled"
+            # Drop it from the scheduler if it has not started yet
+            self.scheduler.cancel(item_id)
+            
+            self.download_states.transition(item_id, CANCELLED)
             
             container.data["status_text"].value = "Stopped"
             container.data["status_container"].bgcolor = "#757575"
             container.data["pause_button"].disabled = True
             container.data["stop_button"].disabled = True
             
-            self.update_ui()
+            self.update_control(container)
             
         except Exception as e:
             print(f"Error stopping download: {str(e)}")
@@ -3005,121 +3786,119 @@ class ModernYouTubeDownloader:
                 if torrent:
                     torrent.set_priority(priority)
                     
+                    # Reorder it in the ready queue if it is still waiting
+                    self.scheduler.set_priority(item_id, priority)
+                    
+                    # Adjust its share of the bandwidth budget if it is running
+                    self.bandwidth_limiter.set_priority(item_id, priority)
+        
         except Exception as e:
             print(f"Error updating torrent priority: {str(e)}")
 
-    def start_next_download(self):
-        """Start the next download in the queue"""
-        try:
-            # Find the next queued item
-            for item in self.video_queue:
-                if item["status"] == "queued":
-                    container = item["container"]
-                    item_id = item["id"]
-                    
-                    # Update status
-                    container.data["status_text"].value = "Starting..."
-                    container.data["status_container"].bgcolor = "#1976D2"
-                    container.data["pause_button"].disabled = False
-                    container.data["stop_button"].disabled = False
-                    self.update_ui()
-                    
-                    # Start download based on type
-                    if item["type"] == "torrent":
-                        self.start_torrent_download(item_id, container)
-                    else:
-                        self.start_video_download(item_id, container)
-                    
-                    break
-                    
-        except Exception as e:
-            print(f"Error starting next download: {str(e)}")
-            
+    def update_video_priority(self, item_id, priority):
+        """Update video queue item priority"""
+        queue_item = self.get_queue_item_by_id(item_id)
+        if not queue_item:
+            return
+        
+        queue_item['priority'] = priority
+        self.queue_store.save(queue_item)
+        self.scheduler.set_priority(item_id, priority)
+        self.bandwidth_limiter.set_priority(item_id, priority)
+
+    def update_video_fragments(self, item_id, fragments):
+        """Set how many fragments a queue item fetches in parallel; applies from its next attempt"""
+        queue_item = self.get_queue_item_by_id(item_id)
+        if not queue_item:
+            return
+        
+        queue_item['fragments'] = fragments
+        self.queue_store.save(queue_item)
+
     def start_torrent_download(self, item_id, container):
-        """Start a torrent download"""
+        """Run a torrent download on the current worker until it completes or is cancelled"""
         try:
             torrent = container.data["torrent"]
             if not torrent:
                 return
                 
+            # Stopped while it was waiting for a slot
+            if not self.download_states.transition(item_id, DOWNLOADING, expected=(QUEUED,)):
+                return
+            
             # Check if any files are selected
             if not any(f['selected'] for f in torrent.files):
+                self.download_states.transition(item_id, CANCELLED)
                 container.data["status_text"].value = "No files selected"
                 container.data["status_container"].bgcolor = "#FFA000"
                 container.data["pause_button"].disabled = True
                 container.data["stop_button"].disabled = True
-                self.update_ui()
+                self.update_control(container)
                 return
                 
-            # Mark as downloading
-            self.active_downloads[item_id] = {"status": "downloading"}
-            
-            def download_loop():
-                try:
-                    # Start the torrent
-                    torrent.start()
-                    
-                    # Update progress until complete or cancelled
-                    while (
-                        item_id in self.active_downloads
-                        and self.active_downloads[item_id]["status"] != "cancelled"
-                        and torrent.progress < 100
-                    ):
-                        if not torrent.is_paused:
-                            # Update progress
-                            container.data["progress_bar"].value = torrent.progress / 100
-                            
-                            # Update status text
-                            details = torrent.get_details()
-                            status = f"Downloading: {details['progress']} | ↓ {details['download_speed']} ↑ {details['upload_speed']} | Seeds: {details['seeds']} | ETA: {details['estimated_time']}"
-                            container.data["status_text"].value = status
-                            
-                            # Update status color
-                            container.data["status_container"].bgcolor = "#1976D2"
-                            
-                            self.update_ui()
-                            
-                        time.sleep(0.5)
-                    
-                    # Check if cancelled
-                    if (
-                        item_id not in self.active_downloads
-                        or self.active_downloads[item_id]["status"] == "cancelled"
-                    ):
-                        container.data["status_text"].value = "Cancelled"
-                        container.data["status_container"].bgcolor = "#757575"
-                    else:
-                        container.data["status_text"].value = "Completed"
-                        container.data["status_container"].bgcolor = "#43A047"
-                        container.data["progress_bar"].value = 1
-                    
-                    # Cleanup
-                    if item_id in self.active_downloads:
-                        del self.active_downloads[item_id]
-                    
-                    # Disable controls
-                    container.data["pause_button"].disabled = True
-                    container.data["stop_button"].disabled = True
+            # Update status
+            container.data["status_text"].value = "Starting..."
+            container.data["status_container"].bgcolor = "#1976D2"
+            container.data["pause_button"].disabled = False
+            container.data["stop_button"].disabled = False
+            self.update_control(container)
+            
+            # Make sure the selected files fit before any peer traffic starts
+            details = torrent.get_details()
+            os.makedirs(torrent.download_path, exist_ok=True)
+            self.disk_guard.reserve(item_id, torrent.download_path, details['total_size'], details['downloaded_size'])
+            
+            # Throttle the transfer against the shared bandwidth budget
+            self.bandwidth_limiter.register(item_id, torrent.priority)
+            torrent.bandwidth_limiter = self.bandwidth_limiter
+            torrent.limiter_key = item_id
+            
+            # Start the torrent
+            torrent.start()
+            
+            # Update progress until complete or cancelled
+            while self.download_states.get(item_id) == DOWNLOADING and torrent.progress < 100:
+                if not torrent.is_paused:
+                    # Update progress
+                    container.data["progress_bar"].value = torrent.progress / 100
+                    
+                    # Update status text
+                    details = torrent.get_details()
+                    self.disk_guard.record_progress(item_id, None, details['downloaded_size'])
+                    status = f"Downloading: {details['progress']} | ↓ {details['download_speed']} ↑ {details['upload_speed']} | Seeds: {details['seeds']} | ETA: {details['estimated_time']}"
+                    container.data["status_text"].value = status
                     
-                    self.update_ui()
+                    # Update status color
+                    container.data["status_container"].bgcolor = "#1976D2"
                     
-                    # Start next download
-                    self.start_next_download()
+                    self.update_control(container)
                     
-                except Exception as e:
-                    print(f"Error in torrent download loop: {str(e)}")
-                    container.data["status_text"].value = f"Error: {str(e)}"
-                    container.data["status_container"].bgcolor = "#E53935"
-                    self.update_ui()
+                time.sleep(0.5)
             
-            # Start download thread
-            Thread(target=download_loop, daemon=True).start()
+            # Completes unless it was stopped first
+            if self.download_states.transition(item_id, DONE, expected=(DOWNLOADING,)):
+                container.data["status_text"].value = "Completed"
+                container.data["status_container"].bgcolor = "#43A047"
+                container.data["progress_bar"].value = 1
+            else:
+                container.data["status_text"].value = "Cancelled"
+                container.data["status_container"].bgcolor = "#757575"
+            
+            # Disable controls
+            container.data["pause_button"].disabled = True
+            container.data["stop_button"].disabled = True
+            
+            self.update_control(container)
             
         except Exception as e:
-            print(f"Error starting torrent download: {str(e)}")
+            print(f"Error in torrent download: {str(e)}")
+            self.download_states.transition(item_id, FAILED)
             container.data["status_text"].value = f"Error: {str(e)}"
             container.data["status_container"].bgcolor = "#E53935"
-            self.update_ui()
+            self.update_control(container)
+        
+        finally:
+            self.bandwidth_limiter.unregister(item_id)
 
     def toggle_files_section(self, item_id, button):
         """Toggle visibility of the files section"""
@@ -3138,7 +3917,7 @@ class ModernYouTubeDownloader:
                     button.icon = ft.Icons.EXPAND_LESS if file_list.visible else ft.Icons.EXPAND_MORE
                     button.data['expanded'] = file_list.visible
                     
-                    self.update_ui()
+                    self.update_control(container)
         except Exception as e:
             print(f"Error toggling files section: {str(e)}")
 
@@ -3200,6 +3979,13 @@ def main(page: ft.Page):
     # Handle app close event
     def on_page_close(e):
         app.is_closing = True
+        app.ui_dirty.set()  # Let the render loop exit
+        app.scheduler.shutdown()
+        app.transcode_pool.shutdown()
+        app.ydl_pool.close()
+        app.archive.close()
+        app.queue_store.close()
+        app.history_store.close()
         print("App is closing, cleaning up...")
         
     page.on_close = on_page_close
@@ -0,0 +1,712 @@
+import errno
+import heapq
+import http.client
+import itertools
+import os
+import random
+import re
+import shutil
+import statistics
+import time
+from collections import deque
+from datetime import datetime
+from threading import Thread, Timer, Lock, RLock
+
+# Lower values are dispatched first; names match the torrent priority dropdown
+PRIORITY_LEVELS = {
+    "High": 0,
+    "Normal": 1,
+    "Low": 2,
+}
+
+# Relative share of the bandwidth budget each priority gets while downloads compete
+PRIORITY_WEIGHTS = {
+    "High": 4,
+    "Normal": 2,
+    "Low": 1,
+}
+
+DEFAULT_MAX_CONCURRENT = 3
+
+# Fragment concurrency the adaptive tuner starts each host at, and the most it will try
+DEFAULT_FRAGMENT_CONCURRENCY = 2
+MAX_FRAGMENT_CONCURRENCY = 16
+
+# Downloads the tuner measures at a level before judging it; their median is the level's throughput
+FRAGMENT_SAMPLES = 3
+# A host held below its limit tries the level above again after this many downloads or seconds
+FRAGMENT_RECOVERY_SUCCESSES = 10
+FRAGMENT_RECOVERY_SECONDS = 30 * 60
+
+# yt-dlp protocols whose downloader fetches fragments concurrently; plain HTTP ignores the setting
+FRAGMENTED_PROTOCOLS = ("m3u8_native", "http_dash_segments", "http_dash_segments_generator")
+
+# Kept free on every volume so a full batch never leaves the disk completely full
+DISK_SPACE_MARGIN = 200 * 1024 * 1024
+
+# HTTP statuses worth another attempt: throttling, expired stream URLs and server-side trouble
+RETRYABLE_HTTP_STATUSES = {403, 408, 425, 429, 500, 502, 503, 504}
+
+# Errors that no amount of retrying fixes
+FATAL_ERROR_PATTERN = re.compile(
+    r"private video|video unavailable|unsupported url|not available in your country|"
+    r"sign in to confirm|members-only|requested format is not available|drm|copyright|"
+    r"has been removed|no video formats",
+    re.IGNORECASE,
+)
+
+# Network failures that usually go away on their own
+TRANSIENT_ERROR_PATTERN = re.compile(
+    r"timed out|connection (reset|refused|aborted)|temporary failure|remote end closed|"
+    r"incompleteread|did not get any data blocks|content too short|network is unreachable|broken pipe",
+    re.IGNORECASE,
+)
+
+# Lifecycle of an active download
+QUEUED = "queued"
+FETCHING = "fetching"
+DOWNLOADING = "downloading"
+POSTPROCESSING = "postprocessing"
+PAUSED = "paused"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# States each state may move to; None is an item that is not active (new, finished or removed)
+DOWNLOAD_TRANSITIONS = {
+    None: (QUEUED,),
+    QUEUED: (FETCHING, DOWNLOADING, PAUSED, CANCELLED, FAILED),
+    FETCHING: (DOWNLOADING, PAUSED, CANCELLED, FAILED, QUEUED),  # Back to queued for a retry
+    DOWNLOADING: (POSTPROCESSING, DONE, PAUSED, CANCELLED, FAILED, QUEUED),
+    POSTPROCESSING: (DONE, CANCELLED, FAILED),
+    PAUSED: (QUEUED, CANCELLED, FAILED),
+}
+
+# Finished states are not kept; the item becomes inactive again
+TERMINAL_STATES = (DONE, FAILED, CANCELLED)
+
+# State listeners of different items run in parallel unless their ids share one of this many locks
+DELIVERY_LOCK_STRIPES = 16
+
+
+def iter_error_chain(error):
+    """Yield an error and the exceptions it wraps (yt-dlp keeps the original in exc_info)"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        wrapped = exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None
+        error = wrapped or error.__cause__ or error.__context__
+
+
+def get_http_status(error):
+    """HTTP status behind a download error, or None when it did not come from an HTTP response"""
+    for e in iter_error_chain(error):
+        status = getattr(e, 'status', None) or getattr(e, 'code', None)
+        if isinstance(status, int) and 100 <= status < 600:
+            return status
+    match = re.search(r"HTTP Error (\d{3})", str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_retryable_error(error):
+    """True for throttling, server and network errors that a later attempt may get past"""
+    if FATAL_ERROR_PATTERN.search(str(error)):
+        return False
+    status = get_http_status(error)
+    if status:
+        return status in RETRYABLE_HTTP_STATUSES
+    for e in iter_error_chain(error):
+        if isinstance(e, (TimeoutError, ConnectionError, http.client.IncompleteRead)):
+            return True
+    return bool(TRANSIENT_ERROR_PATTERN.search(str(error)))
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter, so a batch hit by the same error does not retry in lockstep"""
+    def __init__(self, max_attempts=5, base_delay=2.0, max_delay=300.0):
+        self.max_attempts = max_attempts  # Including the first attempt
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, error, attempt):
+        """attempt is the number of attempts that already failed"""
+        return attempt < self.max_attempts and is_retryable_error(error)
+
+    def get_delay(self, attempt):
+        """Seconds to wait before the next attempt: a random point in the upper half of the backoff window"""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(ceiling / 2, ceiling)
+
+
+class CircuitBreaker:
+    """Per-host failure counter that holds back dispatch while a host keeps failing.
+    
+    After threshold failures within window seconds the breaker opens and jobs for the
+    host wait for cooldown seconds. Then a single trial job is let through: success
+    closes the breaker, another failure reopens it with twice the cooldown.
+    """
+    def __init__(self, threshold=5, window=60.0, cooldown=30.0, max_cooldown=600.0):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = Lock()
+        self._failures = {}  # key -> deque of recent failure times
+        self._open_until = {}  # key -> time the breaker lets a trial through
+        self._cooldowns = {}  # key -> cooldown used the last time it opened
+        self._trials = {}  # key -> start time of the trial job in flight
+
+    def admit(self, key):
+        """Return 0 and count the job as started if key may be dispatched, else seconds to wait"""
+        with self._lock:
+            open_until = self._open_until.get(key)
+            if open_until is None:
+                return 0
+            now = time.time()
+            if open_until > now:
+                return open_until - now
+            
+            # The trial in flight decides; a trial that never reported back (paused or removed) expires
+            trial_started = self._trials.get(key)
+            if trial_started is not None and now - trial_started < self._cooldowns[key]:
+                return trial_started + self._cooldowns[key] - now
+            self._trials[key] = now
+            return 0
+
+    def record_success(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+            self._open_until.pop(key, None)
+            self._cooldowns.pop(key, None)
+            self._trials.pop(key, None)
+
+    def record_failure(self, key):
+        now = time.time()
+        with self._lock:
+            if self._trials.pop(key, None) is not None:
+                # The trial failed too; back off harder
+                cooldown = min(self.max_cooldown, self._cooldowns.get(key, self.cooldown) * 2)
+                self._open(key, cooldown, now)
+                return
+            
+            failures = self._failures.setdefault(key, deque())
+            failures.append(now)
+            while failures and failures[0] < now - self.window:
+                failures.popleft()
+            if len(failures) >= self.threshold and key not in self._open_until:
+                self._open(key, self.cooldown, now)
+
+    def _open(self, key, cooldown, now):
+        # Caller must hold the lock
+        self._cooldowns[key] = cooldown
+        self._open_until[key] = now + cooldown
+        self._failures.pop(key, None)
+
+
+class FragmentTuner:
+    """Picks concurrent_fragment_downloads per host from the throughput of finished downloads.
+    
+    A host starts at DEFAULT_FRAGMENT_CONCURRENCY. A level is judged by the median of its
+    last few downloads, so one slow or fast transfer does not decide it. While the doubled
+    level is at least min_gain times faster than the best so far the tuner keeps climbing;
+    once doubling stops paying off, or the host answers 429, it holds a lower level. A held
+    host probes the level above again after enough downloads or time, since the network
+    or the host's limits may have changed.
+    """
+    def __init__(self, start=DEFAULT_FRAGMENT_CONCURRENCY, max_level=MAX_FRAGMENT_CONCURRENCY, min_gain=1.15,
+                 samples=FRAGMENT_SAMPLES, recovery_successes=FRAGMENT_RECOVERY_SUCCESSES,
+                 recovery_seconds=FRAGMENT_RECOVERY_SECONDS):
+        self.start = start
+        self.max_level = max_level
+        self.min_gain = min_gain
+        self.samples = samples
+        self.recovery_successes = recovery_successes
+        self.recovery_seconds = recovery_seconds
+        self._lock = Lock()
+        self._hosts = {}  # key -> {level, ceiling, best_level, best_rate, rates, successes, held_since}
+
+    def get_level(self, key):
+        with self._lock:
+            return self._state(key)['level']
+
+    def record_throughput(self, key, level, bytes_per_second):
+        """Note the throughput a download reached with level concurrent fragments"""
+        with self._lock:
+            state = self._state(key)
+            # Measured with a level that was changed while the download ran
+            if level != state['level']:
+                return
+            rates = state['rates'].setdefault(level, deque(maxlen=self.samples))
+            rates.append(bytes_per_second)
+            rate = statistics.median(rates)
+            
+            if level == state['best_level']:
+                # Running at the best known level; its rate is what the next probe has to beat
+                state['best_rate'] = rate
+                if state['ceiling'] < level * 2 <= self.max_level and self._recovered(state):
+                    state['ceiling'] = level * 2
+                if len(rates) >= self.samples and level * 2 <= state['ceiling']:
+                    self._probe(state, level * 2)
+                return
+            
+            # Probing the level above the best one
+            if len(rates) < self.samples:
+                return
+            if rate >= state['best_rate'] * self.min_gain:
+                state['best_level'] = level
+                state['best_rate'] = rate
+                if level * 2 <= state['ceiling']:
+                    self._probe(state, level * 2)
+            else:
+                # More parallel requests did not help; stay at the best level for a while
+                self._hold(state, state['best_level'])
+
+    def record_throttled(self, key):
+        """The host answered 429; use half as many parallel requests and stay there for a while"""
+        with self._lock:
+            state = self._state(key)
+            level = max(1, state['level'] // 2)
+            self._hold(state, level)
+            state['best_level'] = level
+            rates = state['rates'].get(level)
+            state['best_rate'] = statistics.median(rates) if rates else 0
+
+    def _probe(self, state, level):
+        # Caller must hold the lock; measurements from an earlier probe of this level are stale
+        state['level'] = level
+        state['rates'][level] = deque(maxlen=self.samples)
+
+    def _hold(self, state, level):
+        # Caller must hold the lock
+        state['level'] = state['ceiling'] = level
+        state['successes'] = 0
+        state['held_since'] = time.monotonic()
+
+    def _recovered(self, state):
+        # Caller must hold the lock; counts one more download at the held level
+        state['successes'] += 1
+        return (
+            state['successes'] >= self.recovery_successes
+            or time.monotonic() - state['held_since'] >= self.recovery_seconds
+        )
+
+    def _state(self, key):
+        # Caller must hold the lock
+        if key not in self._hosts:
+            self._hosts[key] = {
+                'level': self.start,
+                'ceiling': self.max_level,
+                'best_level': self.start,
+                'best_rate': 0,
+                'rates': {},  # level -> recent throughputs measured at it
+                'successes': 0,
+                'held_since': time.monotonic(),
+            }
+        return self._hosts[key]
+
+
+class InsufficientDiskSpace(OSError):
+    """Raised when a download would not fit on its target volume next to the downloads already admitted"""
+    def __init__(self, needed, available):
+        if needed:
+            message = f"Not enough disk space: needs {format_bytes(needed)}, {format_bytes(max(0, available))} available"
+        else:
+            # Size unknown, but the volume is already down to its safety margin
+            message = "Not enough disk space left on the download volume"
+        super().__init__(errno.ENOSPC, message)
+
+
+def format_bytes(nbytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if nbytes < 1024:
+            return f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+    return f"{nbytes:.1f} TB"
+
+
+class DiskSpaceGuard:
+    """Admission control for disk space.
+    
+    Every admitted download reserves the bytes it still has to write on its volume,
+    so downloads started together cannot all count the same free space. The bytes a
+    transfer has written are taken off its reservation as it progresses, since they
+    already show up in the volume's free space.
+    """
+    def __init__(self, margin=DISK_SPACE_MARGIN):
+        self.margin = margin
+        self._lock = Lock()
+        self._reservations = {}  # key -> [volume, expected bytes, {stream: bytes written}]
+
+    def reserve(self, key, path, nbytes, written=0):
+        """Admit a download of nbytes (None when unknown) into path, of which written are already on disk.
+        
+        Raises InsufficientDiskSpace when the volume cannot hold it next to the other reservations.
+        """
+        volume = os.stat(path).st_dev
+        nbytes = max(nbytes or 0, written)
+        with self._lock:
+            self._reservations.pop(key, None)
+            reserved = sum(self._remaining(r) for r in self._reservations.values() if r[0] == volume)
+            available = shutil.disk_usage(path).free - reserved - self.margin
+            if nbytes - written > available:
+                raise InsufficientDiskSpace(nbytes - written, available)
+            # Bytes of a resumed .part file count as written until the transfer reports its own progress
+            self._reservations[key] = [volume, nbytes, {None: written}]
+
+    def record_progress(self, key, stream, downloaded_bytes):
+        """Note how much of a stream is on disk; stream is typically the output filename"""
+        with self._lock:
+            reservation = self._reservations.get(key)
+            if reservation:
+                written = reservation[2]
+                written.pop(None, None)
+                written[stream] = downloaded_bytes
+
+    def release(self, key):
+        with self._lock:
+            self._reservations.pop(key, None)
+
+    def _remaining(self, reservation):
+        # Caller must hold the lock
+        _, nbytes, written = reservation
+        return max(0, nbytes - sum(written.values()))
+
+
+class DownloadScheduler:
+    """Bounded worker pool that runs queued download jobs in priority order.
+    
+    Jobs may carry a delay (for retries) and a host key; a job whose host has an open
+    circuit breaker waits while lower-priority jobs for other hosts go ahead.
+    """
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, circuit_breaker=None):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.circuit_breaker = circuit_breaker
+        self._lock = Lock()
+        self._ready = []  # Heap of (priority, sequence, item_id)
+        self._queued = {}  # item_id -> (sequence, job, key, ready_at) for jobs waiting for a slot
+        self._running = {}  # item_id -> worker thread
+        self._resubmitted = {}  # item_id -> (job, priority, key, delay) to queue once the current run ends
+        self._sequence = itertools.count()
+        self._is_shutdown = False
+        self._wakeup = None  # Timer that re-runs dispatch when the earliest deferred job is due
+        self._wakeup_at = None
+
+    def submit(self, item_id, job, priority="Normal", key=None, delay=0):
+        """Queue a job for execution; returns False if the item is already waiting.
+        
+        key groups jobs by host for the circuit breaker; delay holds the job back for that many seconds.
+        """
+        with self._lock:
+            if self._is_shutdown or item_id in self._queued:
+                return False
+            if item_id in self._running:
+                # Still winding down (e.g. resumed right after a pause); queue it once the slot is released
+                self._resubmitted[item_id] = (job, priority, key, delay)
+                return True
+            self._push(item_id, job, priority, key, time.time() + delay)
+        self._dispatch()
+        return True
+
+    def cancel(self, item_id):
+        """Drop a job that has not started yet; running jobs must stop themselves"""
+        with self._lock:
+            resubmitted = self._resubmitted.pop(item_id, None) is not None
+            # The heap entry is skipped lazily once the job is gone
+            return self._queued.pop(item_id, None) is not None or resubmitted
+
+    def set_priority(self, item_id, priority):
+        """Move a waiting job to a different priority level"""
+        with self._lock:
+            entry = self._queued.get(item_id)
+            if not entry:
+                return False
+            _, job, key, ready_at = entry
+            self._push(item_id, job, priority, key, ready_at)
+            return True
+
+    def set_max_concurrent(self, max_concurrent):
+        """Change the global concurrency limit; extra slots are filled immediately"""
+        with self._lock:
+            self.max_concurrent = max(1, int(max_concurrent))
+        self._dispatch()
+
+    def is_queued(self, item_id):
+        with self._lock:
+            return item_id in self._queued
+
+    def shutdown(self):
+        """Stop dispatching; jobs already running are left to finish"""
+        with self._lock:
+            self._is_shutdown = True
+            self._queued.clear()
+            self._ready.clear()
+            self._resubmitted.clear()
+            if self._wakeup:
+                self._wakeup.cancel()
+
+    def _push(self, item_id, job, priority, key=None, ready_at=0):
+        # Caller must hold the lock
+        sequence = next(self._sequence)
+        self._queued[item_id] = (sequence, job, key, ready_at)
+        heapq.heappush(self._ready, (PRIORITY_LEVELS.get(priority, PRIORITY_LEVELS["Normal"]), sequence, item_id))
+
+    def _is_current(self, entry):
+        # A heap entry is stale once its job was cancelled or re-prioritized
+        queued = self._queued.get(entry[2])
+        return queued is not None and queued[0] == entry[1]
+
+    def _dispatch(self):
+        """Start waiting jobs until every slot is busy"""
+        with self._lock:
+            now = time.time()
+            deferred = []  # Heap entries that are not due yet or whose host is blocked
+            blocked = {}  # key -> seconds its circuit breaker still holds jobs back
+            next_due = float('inf')
+            while not self._is_shutdown and self._ready and len(self._running) < self.max_concurrent:
+                entry = heapq.heappop(self._ready)
+                if not self._is_current(entry):
+                    continue
+                item_id = entry[2]
+                _, job, key, ready_at = self._queued[item_id]
+                
+                wait = ready_at - now
+                if wait <= 0 and key is not None and self.circuit_breaker:
+                    wait = blocked.get(key) or self.circuit_breaker.admit(key)
+                    if wait > 0:
+                        blocked[key] = wait
+                if wait > 0:
+                    deferred.append(entry)
+                    next_due = min(next_due, wait)
+                    continue
+                
+                del self._queued[item_id]
+                worker = Thread(target=self._run, args=(item_id, job), daemon=True)
+                self._running[item_id] = worker
+                worker.start()
+            
+            for entry in deferred:
+                heapq.heappush(self._ready, entry)
+            if next_due != float('inf') and not self._is_shutdown:
+                self._schedule_wakeup(next_due)
+
+    def _schedule_wakeup(self, delay):
+        # Caller must hold the lock
+        due = time.time() + delay
+        if self._wakeup and self._wakeup_at <= due:
+            return
+        if self._wakeup:
+            self._wakeup.cancel()
+        self._wakeup = Timer(delay, self._wake)
+        self._wakeup.daemon = True
+        self._wakeup_at = due
+        self._wakeup.start()
+
+    def _wake(self):
+        with self._lock:
+            self._wakeup = None
+        self._dispatch()
+
+    def _run(self, item_id, job):
+        try:
+            job()
+        except Exception as e:
+            print(f"Error in download job {item_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._running.pop(item_id, None)
+                resubmitted = self._resubmitted.pop(item_id, None)
+                if resubmitted and not self._is_shutdown:
+                    job, priority, key, delay = resubmitted
+                    self._push(item_id, job, priority, key, time.time() + delay)
+            # Hand the freed slot to the next queued item
+            self._dispatch()
+
+
+class BandwidthLimiter:
+    """Process-wide token bucket whose rate is split between active transfers by weight"""
+    def __init__(self, rate=0, burst_seconds=1.0):
+        self.rate = rate  # Bytes per second shared by all transfers; 0 means unlimited
+        self.burst_seconds = burst_seconds
+        self.active_hours = None  # (start_hour, end_hour) during which the cap applies; None means always
+        self._lock = Lock()
+        self._weights = {}  # key -> weight
+        self._buckets = {}  # key -> [tokens, last_refill]
+        self._offsets = {}  # (key, stream) -> downloaded bytes at the previous progress tick
+
+    def register(self, key, priority="Normal"):
+        """Start sharing the budget with a transfer"""
+        with self._lock:
+            self._weights[key] = PRIORITY_WEIGHTS.get(priority, PRIORITY_WEIGHTS["Normal"])
+
+    def unregister(self, key):
+        """Stop tracking a transfer; a blocked consume() for it returns promptly"""
+        with self._lock:
+            self._weights.pop(key, None)
+            self._buckets.pop(key, None)
+            for offset_key in [k for k in self._offsets if k[0] == key]:
+                del self._offsets[offset_key]
+
+    def set_priority(self, key, priority):
+        with self._lock:
+            if key in self._weights:
+                self._weights[key] = PRIORITY_WEIGHTS.get(priority, PRIORITY_WEIGHTS["Normal"])
+
+    def set_rate(self, rate):
+        """Change the total cap in bytes per second; 0 disables limiting"""
+        with self._lock:
+            self.rate = max(0, rate)
+            self._buckets.clear()
+
+    def set_active_hours(self, active_hours):
+        """Only apply the cap between (start_hour, end_hour); None applies it around the clock"""
+        with self._lock:
+            self.active_hours = active_hours
+            self._buckets.clear()
+
+    def is_limited(self):
+        if not self.rate:
+            return False
+        if self.active_hours:
+            start_hour, end_hour = self.active_hours
+            return start_hour <= datetime.now().hour < end_hour
+        return True
+
+    def record_progress(self, key, stream, downloaded_bytes):
+        """Charge the bytes a stream received since its previous progress tick"""
+        with self._lock:
+            if key not in self._weights:
+                return
+            previous = self._offsets.get((key, stream))
+            self._offsets[(key, stream)] = downloaded_bytes
+        # The first tick after a (re)start only sets the baseline, so resumed bytes are not charged
+        if previous is not None and downloaded_bytes > previous:
+            self.consume(key, downloaded_bytes - previous)
+
+    def consume(self, key, nbytes):
+        """Take nbytes from the transfer's share, sleeping while its bucket is in deficit"""
+        with self._lock:
+            # A transfer that was never registered or already unregistered must not take a share
+            if not self.is_limited() or key not in self._weights:
+                return
+            tokens = self._refill(key) - nbytes
+            self._buckets[key][0] = tokens
+        
+        while tokens < 0:
+            with self._lock:
+                if key not in self._weights or not self.is_limited():
+                    return
+                share = self._share(key)
+            # Sleep in short slices so rate, weight and pause changes take effect quickly
+            time.sleep(min(-tokens / share, 0.25))
+            with self._lock:
+                if key not in self._buckets:
+                    return
+                tokens = self._refill(key)
+
+    def _share(self, key):
+        # Caller must hold the lock
+        return self.rate * self._weights[key] / sum(self._weights.values())
+
+    def _refill(self, key):
+        # Caller must hold the lock
+        now = time.time()
+        share = self._share(key)
+        capacity = share * self.burst_seconds
+        bucket = self._buckets.setdefault(key, [capacity, now])
+        bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * share)
+        bucket[1] = now
+        return bucket[0]
+
+
+class QueueRegistry:
+    """Id-indexed lookup of queue items, with collision-free id allocation"""
+    def __init__(self):
+        self._lock = Lock()
+        self._items = {}  # item_id -> queue item
+        self._next_id = 1
+
+    def new_id(self, prefix):
+        """Allocate a fresh id; numbers are never reused, even after removals"""
+        with self._lock:
+            item_id = f"{prefix}_{self._next_id}"
+            self._next_id += 1
+            return item_id
+
+    def reserve(self, item_id):
+        """Keep the allocator ahead of an id restored from a previous session"""
+        prefix, _, number = item_id.rpartition("_")
+        if prefix in ("queue", "torrent") and number.isdigit():
+            with self._lock:
+                self._next_id = max(self._next_id, int(number) + 1)
+
+    def add_item(self, queue_item):
+        with self._lock:
+            self._items[queue_item['id']] = queue_item
+
+    def get_item(self, item_id):
+        return self._items.get(item_id)
+
+    def remove(self, item_id):
+        """Forget an item; returns the queue item or None"""
+        with self._lock:
+            return self._items.pop(item_id, None)
+
+
+class DownloadStates:
+    """Thread-safe state machine for active downloads.
+    
+    Every change goes through transition(), which checks DOWNLOAD_TRANSITIONS under a
+    lock, so two threads racing (e.g. a pause against a finishing worker) cannot both
+    win. Listeners are called as listener(item_id, old_state, new_state) after that lock
+    is released, so their disk and UI work never holds up other workers. Each change
+    carries a sequence number; changes of one item are delivered one at a time, and one
+    that arrives after a newer change of the same item was delivered is dropped.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._states = {}  # item_id -> state of active items
+        self._listeners = []
+        self._sequence = itertools.count(1)
+        self._delivered = {}  # item_id -> sequence number of the last change listeners saw
+        # Delivery is serialized per item through one of these, picked by id; re-entrant so a listener may transition
+        self._delivery_locks = [RLock() for _ in range(DELIVERY_LOCK_STRIPES)]
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def get(self, item_id):
+        """Current state, or None when the item is not active"""
+        return self._states.get(item_id)
+
+    def transition(self, item_id, state, expected=None):
+        """Move an item to state; returns False if the move is not allowed from its current state.
+        
+        expected optionally narrows the states the move may start from.
+        """
+        with self._lock:
+            old_state = self._states.get(item_id)
+            if expected is not None and old_state not in expected:
+                return False
+            if state not in DOWNLOAD_TRANSITIONS.get(old_state, ()):
+                return False
+            
+            if state in TERMINAL_STATES:
+                self._states.pop(item_id, None)
+            else:
+                self._states[item_id] = state
+            sequence = next(self._sequence)
+        
+        with self._delivery_locks[hash(item_id) % DELIVERY_LOCK_STRIPES]:
+            with self._lock:
+                if sequence < self._delivered.get(item_id, 0):
+                    # A later change of this item overtook this one; listeners already saw the newer state
+                    return True
+                self._delivered[item_id] = sequence
+            for listener in self._listeners:
+                try:
+                    listener(item_id, old_state, state)
+                except Exception as e:
+                    print(f"Error in download state listener: {str(e)}")
+        return True
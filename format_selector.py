@@ -0,0 +1,128 @@
+# Maximum height for each quality option; "best" has no limit
+QUALITY_HEIGHTS = {
+    "best": None,
+    "1080p": 1080,
+    "720p": 720,
+    "480p": 480,
+    "360p": 360,
+    "240p": 240,
+    "144p": 144,
+}
+
+DEFAULT_HEIGHT = 720
+
+# Higher is better; H.264/AAC in MP4 plays everywhere and merges without re-encoding
+VIDEO_CODEC_PREFERENCE = {"avc1": 3, "vp9": 2, "vp09": 2, "av01": 1}
+AUDIO_CODEC_PREFERENCE = {"mp4a": 3, "opus": 2, "vorbis": 1}
+CONTAINER_PREFERENCE = {"mp4": 2, "m4a": 2, "webm": 1}
+
+# Containers that hold a video and an audio extension without remuxing either; anything else goes into MKV
+MERGE_CONTAINERS = {("mp4", "m4a"): "mp4", ("mp4", "mp4"): "mp4", ("webm", "webm"): "webm"}
+
+
+def get_max_height(quality):
+    """Height limit for a quality option, None for "best" """
+    return QUALITY_HEIGHTS.get(quality, DEFAULT_HEIGHT)
+
+
+def get_format_string(quality):
+    """Generic yt-dlp selector for a quality option, used when no formats list is available"""
+    height = get_max_height(quality)
+    limit = f"[height<={height}]" if height else ""
+    return f"bestvideo{limit}[ext=mp4]+bestaudio[ext=m4a]/best{limit}[ext=mp4]/best"
+
+
+def get_fallback_format_string(quality):
+    """Selector that never needs a merge, for systems without ffmpeg"""
+    return f"best[height<={get_max_height(quality) or 1080}]"
+
+
+def get_format_size(fmt):
+    return fmt.get('filesize') or fmt.get('filesize_approx')
+
+
+def get_merge_ext(video_ext, audio_ext):
+    """Container for a merged video and audio stream, following yt-dlp's own choice"""
+    return MERGE_CONTAINERS.get((video_ext, audio_ext), "mkv")
+
+
+def _has(codec):
+    # yt-dlp reports "none" for a missing stream and None when it does not know
+    return codec not in (None, "none")
+
+
+def _codec_score(codec, preference):
+    return preference.get((codec or "").split(".")[0], 0)
+
+
+def _video_score(fmt):
+    return (
+        fmt.get('height') or 0,
+        _codec_score(fmt.get('vcodec'), VIDEO_CODEC_PREFERENCE),
+        CONTAINER_PREFERENCE.get(fmt.get('ext'), 0),
+        fmt.get('fps') or 0,
+        # Prefer the smaller file among otherwise equal streams
+        -(get_format_size(fmt) or 0),
+    )
+
+
+def _audio_score(fmt, video_ext=None):
+    return (
+        # Matching containers merge into MP4 without remuxing the audio
+        fmt.get('ext') == {"mp4": "m4a"}.get(video_ext, video_ext),
+        _codec_score(fmt.get('acodec'), AUDIO_CODEC_PREFERENCE),
+        fmt.get('abr') or fmt.get('tbr') or 0,
+    )
+
+
+def select_video_formats(formats, quality, can_merge=True):
+    """Pick exact format ids for a video download from an extracted formats list.
+    
+    Returns a dict with the yt-dlp format_id ("137+140" or "22"), the chosen height,
+    the expected size in bytes (None when unknown), the output extension and whether
+    a merge is needed, or None when the list has nothing usable and a generic
+    selector has to be used.
+    """
+    max_height = get_max_height(quality)
+    
+    candidates = [
+        f for f in formats or []
+        if f.get('format_id') and f.get('height') and _has(f.get('vcodec'))
+        and (max_height is None or f['height'] <= max_height)
+    ]
+    progressive = [f for f in candidates if _has(f.get('acodec'))]
+    video_only = [f for f in candidates if f.get('acodec') == "none"]
+    audio_only = [
+        f for f in formats or []
+        if f.get('format_id') and _has(f.get('acodec')) and f.get('vcodec') == "none"
+    ]
+    
+    best_progressive = max(progressive, key=_video_score, default=None)
+    best_pair = None
+    if can_merge and video_only and audio_only:
+        video = max(video_only, key=_video_score)
+        audio = max(audio_only, key=lambda f: _audio_score(f, video.get('ext')))
+        best_pair = (video, audio)
+    
+    # A progressive stream wins whenever it is at least as tall, since it skips the merge
+    if best_progressive and (not best_pair or best_progressive['height'] >= best_pair[0]['height']):
+        return {
+            'format_id': best_progressive['format_id'],
+            'height': best_progressive['height'],
+            'filesize': get_format_size(best_progressive),
+            'ext': best_progressive.get('ext'),
+            'needs_merge': False,
+        }
+    
+    if best_pair:
+        video, audio = best_pair
+        sizes = [get_format_size(video), get_format_size(audio)]
+        return {
+            'format_id': f"{video['format_id']}+{audio['format_id']}",
+            'height': video['height'],
+            'filesize': sum(sizes) if all(sizes) else None,
+            'ext': get_merge_ext(video.get('ext'), audio.get('ext')),
+            'needs_merge': True,
+        }
+    
+    return None
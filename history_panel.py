@@ -0,0 +1,268 @@
+import flet as ft
+from datetime import datetime
+from typing import Callable, Dict, Any
+
+from panel_mixins import RefreshMixin
+
+# Records shown per history page; only this many rows exist as controls at a time
+PAGE_SIZE = 25
+
+# History filter options and the stored state each one shows; None shows everything
+HISTORY_FILTERS = {
+    "All": None,
+    "Completed": "completed",
+    "Failed": "failed",
+}
+
+DOWNLOAD_TYPE_LABELS = {
+    "video": "Video",
+    "audio": "Audio MP3",
+    "audio_hq": "Audio HQ",
+}
+
+
+class HistoryPanel(RefreshMixin):
+    """Paged browser for finished downloads that were moved out of the live queue"""
+    def __init__(self, page: ft.Page, history_store, on_action: Callable[[Dict[str, Any]], None]):
+        self.page = page
+        self.history_store = history_store
+        self.on_action = on_action
+        self.offset = 0
+        self.total = 0
+        self.init_controls()
+
+    def init_controls(self):
+        self.filter_dropdown = ft.Dropdown(
+            label="Show",
+            options=[ft.dropdown.Option(name) for name in HISTORY_FILTERS],
+            value="All",
+            width=160,
+            on_change=self.change_filter,
+            color="#ffffff",
+            bgcolor="#222222",
+        )
+        
+        self.count_text = ft.Text("0 items", size=14, color="#bbbbbb")
+        self.page_text = ft.Text("Page 1 of 1", size=14, color="#bbbbbb")
+        
+        self.prev_button = ft.IconButton(
+            icon=ft.Icons.CHEVRON_LEFT,
+            icon_color="#ffffff",
+            tooltip="Previous page",
+            on_click=self.prev_page,
+            disabled=True,
+        )
+        self.next_button = ft.IconButton(
+            icon=ft.Icons.CHEVRON_RIGHT,
+            icon_color="#ffffff",
+            tooltip="Next page",
+            on_click=self.next_page,
+            disabled=True,
+        )
+        
+        self.history_list = ft.ListView(
+            spacing=5,
+            padding=10,
+            expand=True,
+        )
+        
+        # History button (visible in main UI)
+        self.history_button = ft.IconButton(
+            icon=ft.Icons.HISTORY,
+            icon_color="#ffffff",
+            icon_size=24,
+            tooltip="Download History",
+            on_click=self.toggle_history,
+        )
+        
+        # History panel container (hidden by default)
+        self.history_container = ft.Container(
+            content=ft.Column(
+                [
+                    # Header with close button
+                    ft.Row(
+                        [
+                            ft.Row(
+                                [
+                                    ft.Icon(ft.Icons.HISTORY, color="#ff0000", size=20),
+                                    ft.Text("Download History", size=20, weight=ft.FontWeight.BOLD, color="#ffffff"),
+                                ],
+                                spacing=5,
+                            ),
+                            ft.IconButton(
+                                icon=ft.Icons.CLOSE,
+                                icon_color="#ffffff",
+                                icon_size=20,
+                                tooltip="Close",
+                                on_click=self.toggle_history,
+                            ),
+                        ],
+                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                    ),
+                    
+                    ft.Divider(height=1, color="#333333"),
+                    
+                    ft.Row(
+                        [
+                            self.filter_dropdown,
+                            self.count_text,
+                        ],
+                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                    ),
+                    
+                    ft.Container(
+                        content=self.history_list,
+                        bgcolor="#111111",
+                        border_radius=8,
+                        expand=True,
+                    ),
+                    
+                    # Pager
+                    ft.Row(
+                        [
+                            self.prev_button,
+                            self.page_text,
+                            self.next_button,
+                        ],
+                        alignment=ft.MainAxisAlignment.CENTER,
+                    ),
+                ],
+                spacing=10,
+            ),
+            width=850,
+            height=700,
+            bgcolor="#0f0f0f",
+            border_radius=10,
+            padding=20,
+            visible=False,
+        )
+
+    def get_history_button(self):
+        return self.history_button
+
+    def get_history_panel(self):
+        return self.history_container
+
+    def toggle_history(self, e=None):
+        self.history_container.visible = not self.history_container.visible
+        if self.history_container.visible:
+            self.offset = 0
+            self.load_page()
+        self.page.update()
+
+    def get_state_filter(self):
+        return HISTORY_FILTERS.get(self.filter_dropdown.value)
+
+    def change_filter(self, e):
+        self.offset = 0
+        self.load_page()
+        self.refresh(self.history_container)
+
+    def next_page(self, e):
+        if self.offset + PAGE_SIZE < self.total:
+            self.offset += PAGE_SIZE
+            self.load_page()
+            self.refresh(self.history_container)
+
+    def prev_page(self, e):
+        if self.offset > 0:
+            self.offset = max(0, self.offset - PAGE_SIZE)
+            self.load_page()
+            self.refresh(self.history_container)
+
+    def load_page(self):
+        """Read one page of records and rebuild the rows; earlier pages' controls are dropped"""
+        state = self.get_state_filter()
+        self.total = self.history_store.count(state)
+        # Step back if the last record of the final page was removed
+        if self.offset >= self.total and self.offset > 0:
+            self.offset = max(0, (self.total - 1) // PAGE_SIZE * PAGE_SIZE)
+        records = self.history_store.page(self.offset, PAGE_SIZE, state)
+        
+        self.history_list.controls = [self.build_row(record) for record in records]
+        if not records:
+            self.history_list.controls = [
+                ft.Text("No finished downloads yet", size=14, color="#bbbbbb", italic=True)
+            ]
+        
+        pages = max(1, (self.total + PAGE_SIZE - 1) // PAGE_SIZE)
+        self.page_text.value = f"Page {self.offset // PAGE_SIZE + 1} of {pages}"
+        self.count_text.value = f"{self.total} items"
+        self.prev_button.disabled = self.offset == 0
+        self.next_button.disabled = self.offset + PAGE_SIZE >= self.total
+
+    def build_row(self, record):
+        item = record['item']
+        failed = record['state'] == "failed"
+        finished = datetime.fromtimestamp(record['finished_at']).strftime("%Y-%m-%d %H:%M")
+        details = f"{DOWNLOAD_TYPE_LABELS.get(item.get('download_type'), item.get('download_type'))} • {item.get('quality')} • {finished}"
+        
+        info_column = [
+            ft.Text(
+                record['title'] or "Unknown Title",
+                size=14,
+                weight=ft.FontWeight.BOLD,
+                color="white",
+                max_lines=1,
+                overflow=ft.TextOverflow.ELLIPSIS,
+            ),
+            ft.Text(details, size=12, color="#bbbbbb"),
+        ]
+        if failed and record['error']:
+            info_column.append(
+                ft.Text(record['error'], size=12, color="#F44336", max_lines=2, overflow=ft.TextOverflow.ELLIPSIS)
+            )
+        
+        return ft.Container(
+            content=ft.Row(
+                [
+                    ft.Container(
+                        content=ft.Text("Failed" if failed else "Completed", size=11, color="white"),
+                        bgcolor="#F44336" if failed else "#4CAF50",
+                        padding=ft.padding.all(3),
+                        border_radius=ft.border_radius.all(4),
+                    ),
+                    ft.Column(info_column, spacing=2, expand=True),
+                    ft.IconButton(
+                        icon=ft.Icons.FOLDER_OPEN,
+                        icon_color="#ffffff",
+                        icon_size=20,
+                        tooltip="Open folder",
+                        on_click=lambda e, r=record: self.send("open_history_folder", r),
+                    ),
+                    ft.IconButton(
+                        icon=ft.Icons.REPLAY,
+                        icon_color="#ffffff",
+                        icon_size=20,
+                        tooltip="Download again",
+                        on_click=lambda e, r=record: self.requeue(r),
+                    ),
+                    ft.IconButton(
+                        icon=ft.Icons.DELETE_OUTLINE,
+                        icon_color="#ffffff",
+                        icon_size=20,
+                        tooltip="Remove from history",
+                        on_click=lambda e, r=record: self.delete(r),
+                    ),
+                ],
+                spacing=10,
+                vertical_alignment=ft.CrossAxisAlignment.CENTER,
+            ),
+            padding=10,
+            bgcolor="#1a1a1a",
+            border_radius=ft.border_radius.all(8),
+        )
+
+    def requeue(self, record):
+        """Put the download back into the live queue and drop it from the history"""
+        self.send("requeue_history", record)
+        self.delete(record)
+
+    def delete(self, record):
+        self.history_store.remove(record['id'])
+        self.load_page()
+        self.refresh(self.history_container)
+
+    def send(self, action_type, record):
+        if self.on_action:
+            self.on_action({"type": action_type, "value": record})
@@ -0,0 +1,174 @@
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+# ffmpeg encoder used for each target audio format
+AUDIO_ENCODERS = {
+    "mp3": "libmp3lame",
+    "m4a": "aac",
+}
+
+# Standard encoder bitrates (kbps); a capped target is rounded up to the next one
+STANDARD_BITRATES = [32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+
+# yt-dlp acodec prefixes that can be stored in each target format without re-encoding
+COPYABLE_ACODECS = {
+    "mp3": ("mp3",),
+    "m4a": ("mp4a", "aac"),
+}
+
+
+def get_source_bitrate(source_format):
+    """Audio bitrate (kbps) of a yt-dlp format, or None when the extractor did not report it"""
+    return source_format.get('abr') or source_format.get('tbr')
+
+
+def cap_audio_bitrate(bitrate, source_bitrate):
+    """Limit the requested bitrate (kbps string) to what the source actually carries.
+    
+    Encoding a 128 kbps stream at 320 kbps only makes the file bigger, so the target
+    becomes the smallest standard bitrate that covers the source.
+    """
+    if not source_bitrate:
+        return bitrate
+    for standard in STANDARD_BITRATES:
+        if standard >= source_bitrate:
+            return str(min(int(bitrate), standard))
+    return bitrate
+
+
+def plan_audio_conversion(source_format, codec, bitrate):
+    """Decide how a downloaded stream becomes codec at bitrate (kbps).
+    
+    Returns "keep" when the file can be used as-is, "copy" when only the container
+    changes and "encode" when ffmpeg has to re-encode the audio.
+    """
+    acodec = (source_format.get('acodec') or "").lower()
+    if not acodec.startswith(COPYABLE_ACODECS.get(codec, (codec,))):
+        return "encode"
+    
+    # A stream above the requested bitrate still has to be re-encoded down; unknown bitrates are copied
+    source_bitrate = get_source_bitrate(source_format)
+    if source_bitrate and source_bitrate > float(bitrate):
+        return "encode"
+    
+    return "keep" if source_format.get('ext') == codec else "copy"
+
+
+def build_audio_command(input_path, output_path, codec, bitrate, copy=False):
+    """Build the ffmpeg command line that converts input_path to the target codec and bitrate (kbps)"""
+    command = [
+        "ffmpeg", "-y", "-nostdin", "-loglevel", "error",
+        "-i", input_path,
+        "-vn",
+    ]
+    if copy:
+        # Remux only: the source stream already has the target codec
+        command += ["-c:a", "copy"]
+    else:
+        command += ["-c:a", AUDIO_ENCODERS.get(codec, codec), "-b:a", f"{bitrate}k"]
+    return command + [output_path]
+
+
+def build_merge_command(video_path, audio_path, output_path):
+    """Build the ffmpeg command line that muxes separately downloaded video and audio streams"""
+    return [
+        "ffmpeg", "-y", "-nostdin", "-loglevel", "error",
+        "-i", video_path,
+        "-i", audio_path,
+        # Both streams are already in their final codecs, so this only rewrites the container
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c", "copy",
+        output_path,
+    ]
+
+
+class TranscodePool:
+    """CPU-sized pool for ffmpeg conversions, kept apart from the network download workers"""
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="transcode")
+        self._lock = Lock()
+        self._processes = {}  # item_id -> running ffmpeg process
+        self._cancelled = set()  # item_ids whose conversion was cancelled
+
+    def submit(self, item_id, input_path, codec, bitrate, copy=False, on_start=None, on_done=None):
+        """Queue an audio conversion next to the downloaded file.
+        
+        on_start() runs when a CPU slot picks the job up and on_done(output_path, error)
+        when it finishes; both are called from the pool thread.
+        """
+        output_path = os.path.splitext(input_path)[0] + f".{codec}"
+        
+        # ffmpeg cannot convert a file onto itself, so move a same-named source aside
+        if os.path.abspath(input_path) == os.path.abspath(output_path):
+            source_path = input_path + ".source"
+            os.replace(input_path, source_path)
+            input_path = source_path
+        
+        command = build_audio_command(input_path, output_path, codec, bitrate, copy)
+        return self._executor.submit(self._run, item_id, command, [input_path], output_path, on_start, on_done)
+
+    def submit_merge(self, item_id, video_path, audio_path, output_path, on_start=None, on_done=None):
+        """Queue a copy-only merge of a video and an audio stream into output_path; callbacks as for submit"""
+        command = build_merge_command(video_path, audio_path, output_path)
+        return self._executor.submit(self._run, item_id, command, [video_path, audio_path], output_path, on_start, on_done)
+
+    def cancel(self, item_id, timeout=1):
+        """Skip an item's waiting conversion or kill its running ffmpeg, waiting briefly for it to exit"""
+        with self._lock:
+            self._cancelled.add(item_id)
+            process = self._processes.get(item_id)
+        if process:
+            process.kill()
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                pass
+
+    def shutdown(self):
+        """Stop accepting work; conversions already running finish in the background"""
+        self._executor.shutdown(wait=False)
+
+    def _run(self, item_id, command, input_paths, output_path, on_start, on_done):
+        try:
+            if item_id in self._cancelled:
+                return
+            if on_start:
+                on_start()
+            
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+            )
+            with self._lock:
+                self._processes[item_id] = process
+                # Cancelled between the check above and the start of ffmpeg
+                if item_id in self._cancelled:
+                    process.kill()
+            _, stderr = process.communicate()
+            
+            # Killed by cancel(); the caller cleans up the partial output
+            if item_id in self._cancelled:
+                return
+            
+            if process.returncode != 0:
+                message = stderr.decode(errors="replace").strip().splitlines()
+                raise RuntimeError(f"ffmpeg failed: {message[-1] if message else process.returncode}")
+            
+            # The downloaded sources are no longer needed once the conversion succeeded
+            for input_path in input_paths:
+                os.remove(input_path)
+            
+            if on_done:
+                on_done(output_path, None)
+        except Exception as e:
+            print(f"Error converting to {output_path}: {str(e)}")
+            if on_done:
+                on_done(None, e)
+        finally:
+            with self._lock:
+                self._processes.pop(item_id, None)
+                self._cancelled.discard(item_id)
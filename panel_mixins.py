@@ -0,0 +1,9 @@
+class RefreshMixin:
+    """Partial redraws for panels that hold a page and an optional on_action callback into the app"""
+
+    def refresh(self, *controls):
+        """Redraw only the given controls; the app batches them into its next UI frame"""
+        if self.on_action:
+            self.on_action({"type": "update_controls", "value": controls})
+        else:
+            self.page.update(*controls)
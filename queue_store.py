@@ -0,0 +1,249 @@
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock
+
+# Application data lives next to the user's other dotfiles
+DATA_DIR = Path.home() / ".streamsaver"
+ARCHIVE_DB = DATA_DIR / "archive.db"
+QUEUE_DB = DATA_DIR / "queue.db"
+HISTORY_DB = DATA_DIR / "history.db"
+
+# Queue item fields that are too large or too short-lived to persist; they are re-extracted on resume
+TRANSIENT_VIDEO_FIELDS = ("info", "formats", "fetched_at")
+
+# Queue item fields that only describe the live row; history records drop them
+TRANSIENT_QUEUE_FIELDS = ("view", "status", "progress")
+
+
+def connect(path):
+    """Open a SQLite database in WAL mode that several threads share behind one lock"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(str(path), check_same_thread=False)
+    # WAL keeps every committed write across a crash while readers never block the writer
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def compact_queue_item(queue_item, fields=TRANSIENT_QUEUE_FIELDS):
+    """Copy of a queue item without the extracted info and the given live-only fields"""
+    item = {key: value for key, value in queue_item.items() if key not in fields}
+    item['video_info'] = {
+        key: value for key, value in queue_item['video_info'].items()
+        if key not in TRANSIENT_VIDEO_FIELDS
+    }
+    return item
+
+
+class DownloadArchive:
+    """SQLite index of finished downloads keyed by extractor, video id and format"""
+    def __init__(self, path=ARCHIVE_DB):
+        self._lock = Lock()
+        self._conn = connect(path)
+        # The primary key is the lookup index, so a duplicate check is a single B-tree probe
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS downloads (
+                extractor TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                format TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                downloaded_at REAL NOT NULL,
+                PRIMARY KEY (extractor, video_id, format)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+
+    def lookup(self, extractor, video_id, fmt):
+        """Return the file of an earlier download, or None if there is none or it was deleted"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_path FROM downloads WHERE extractor = ? AND video_id = ? AND format = ?",
+                (extractor, video_id, fmt),
+            ).fetchone()
+        if not row:
+            return None
+        
+        if not os.path.exists(row[0]):
+            # The file was removed outside the app, so the video may be downloaded again
+            self.remove(extractor, video_id, fmt)
+            return None
+        return row[0]
+
+    def record(self, extractor, video_id, fmt, file_path):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?)",
+                (extractor, video_id, fmt, file_path, time.time()),
+            )
+            self._conn.commit()
+
+    def remove(self, extractor, video_id, fmt):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM downloads WHERE extractor = ? AND video_id = ? AND format = ?",
+                (extractor, video_id, fmt),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class QueueStore:
+    """Durable copy of the download queue; every state transition is committed as it happens"""
+    def __init__(self, path=QUEUE_DB):
+        self._lock = Lock()
+        self._conn = connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queue_items (
+                id TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        row = self._conn.execute("SELECT MAX(position) FROM queue_items").fetchone()
+        self._next_position = (row[0] or 0) + 1
+
+    def add(self, queue_items, state="pending"):
+        """Append items in one transaction, so a whole playlist batch costs a single commit"""
+        now = time.time()
+        with self._lock:
+            rows = []
+            for queue_item in queue_items:
+                rows.append((queue_item['id'], self._next_position, state, self._serialize(queue_item), now))
+                self._next_position += 1
+            self._conn.executemany("INSERT OR REPLACE INTO queue_items VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def save(self, queue_item):
+        """Persist changed item fields such as priority or filename_base"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE queue_items SET data = ?, updated_at = ? WHERE id = ?",
+                (self._serialize(queue_item), time.time(), queue_item['id']),
+            )
+            self._conn.commit()
+
+    def set_state(self, item_id, state):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE queue_items SET state = ?, updated_at = ? WHERE id = ?",
+                (state, time.time(), item_id),
+            )
+            self._conn.commit()
+
+    def remove(self, item_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM queue_items WHERE id = ?", (item_id,))
+            self._conn.commit()
+
+    def load(self):
+        """Return (queue_item, state) pairs in queue order"""
+        with self._lock:
+            rows = self._conn.execute("SELECT data, state FROM queue_items ORDER BY position").fetchall()
+        return [(json.loads(data), state) for data, state in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _serialize(self, queue_item):
+        # Row appearance is rebuilt when the queue is restored
+        return json.dumps(compact_queue_item(queue_item, fields=("view",)))
+
+
+class HistoryStore:
+    """Finished queue items, compacted out of the live queue and browsed a page at a time"""
+    def __init__(self, path=HISTORY_DB):
+        self._lock = Lock()
+        self._conn = connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS history (
+                id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                title TEXT NOT NULL,
+                error TEXT,
+                finished_at REAL NOT NULL,
+                data TEXT NOT NULL
+            )
+            """
+        )
+        # Pages are read newest first, optionally narrowed to one state
+        self._conn.execute("CREATE INDEX IF NOT EXISTS history_finished ON history (finished_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS history_state ON history (state, finished_at)")
+        self._conn.commit()
+
+    def add(self, queue_item, state, error=None):
+        """Store a finished queue item as a small record"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    queue_item['id'],
+                    state,
+                    queue_item['video_info'].get('title') or "",
+                    str(error) if error else None,
+                    time.time(),
+                    json.dumps(compact_queue_item(queue_item)),
+                ),
+            )
+            self._conn.commit()
+
+    def count(self, state=None):
+        with self._lock:
+            if state:
+                row = self._conn.execute("SELECT COUNT(*) FROM history WHERE state = ?", (state,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT COUNT(*) FROM history").fetchone()
+        return row[0]
+
+    def page(self, offset, limit, state=None):
+        """Return up to limit records, newest first, as dicts with the stored queue item under 'item'"""
+        query = "SELECT id, state, title, error, finished_at, data FROM history"
+        params = ()
+        if state:
+            query += " WHERE state = ?"
+            params = (state,)
+        query += " ORDER BY finished_at DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(query, params + (limit, offset)).fetchall()
+        return [
+            {
+                'id': item_id,
+                'state': state,
+                'title': title,
+                'error': error,
+                'finished_at': finished_at,
+                'item': json.loads(data),
+            }
+            for item_id, state, title, error, finished_at, data in rows
+        ]
+
+    def last_id(self):
+        """Highest numbered item id in the history, or None when it is empty"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM history ORDER BY CAST(SUBSTR(id, INSTR(id, '_') + 1) AS INTEGER) DESC LIMIT 1"
+            ).fetchone()
+        return row[0] if row else None
+
+    def remove(self, item_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM history WHERE id = ?", (item_id,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,140 @@
+import flet as ft
+from threading import Lock
+
+# Estimated height of a collapsed queue row including list spacing; sizes the scroll spacers
+ROW_HEIGHT = 105
+
+# Rows built above and below the viewport so fast scrolling does not show gaps
+OVERSCAN = 5
+
+# Assumed viewport height until the first scroll event reports the real one
+DEFAULT_VIEWPORT_HEIGHT = 800
+
+# Queue filter options and the item states each one shows; None shows everything
+STATUS_FILTERS = {
+    "All": None,
+    "Active": ("queued", "downloading", "converting"),
+    "Not started": ("pending",),
+    "Paused": ("paused",),
+    "Completed": ("completed",),
+    "Failed": ("failed", "cancelled"),
+}
+
+
+class VirtualQueueView:
+    """Queue list that only keeps controls for the rows around the viewport.
+    
+    Rows outside the window are replaced by two spacer containers sized from
+    ROW_HEIGHT, so the scrollbar still reflects the full queue. build_row(item_id)
+    creates a row control on demand; get_state(item_id) returns the state used by
+    the status filter.
+    """
+    def __init__(self, build_row, get_state, on_change=None, row_height=ROW_HEIGHT, overscan=OVERSCAN):
+        self.build_row = build_row
+        self.get_state = get_state
+        self.on_change = on_change  # Called with the list view whenever the visible rows change
+        self.row_height = row_height
+        self.overscan = overscan
+        self._lock = Lock()
+        self._ids = []  # Every item id in queue order
+        self._filtered = []  # Ids that pass the current filter
+        self._pinned = {}  # item_id -> control that is kept even when scrolled away
+        self._rows = {}  # item_id -> control built for the current window
+        self._states = None  # States shown by the filter, None for all
+        self._scroll_offset = 0
+        self._viewport_height = DEFAULT_VIEWPORT_HEIGHT
+        self._window = None  # (first, last, filtered count) of the rows currently built
+        
+        self._top_spacer = ft.Container(height=0)
+        self._bottom_spacer = ft.Container(height=0)
+        self.list_view = ft.ListView(
+            controls=[self._top_spacer, self._bottom_spacer],
+            spacing=5,
+            padding=10,
+            expand=True,
+            on_scroll=self._on_scroll,
+            on_scroll_interval=50,
+        )
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, item_id, control=None):
+        """Append a row; a given control is pinned instead of being rebuilt on demand"""
+        with self._lock:
+            self._ids.append(item_id)
+            if control is not None:
+                self._pinned[item_id] = control
+            if self._matches(item_id):
+                self._filtered.append(item_id)
+
+    def remove(self, item_id):
+        with self._lock:
+            if item_id in self._ids:
+                self._ids.remove(item_id)
+            if item_id in self._filtered:
+                self._filtered.remove(item_id)
+            self._pinned.pop(item_id, None)
+            self._rows.pop(item_id, None)
+
+    def get_control(self, item_id):
+        """Return the row control if it is currently built, else None"""
+        return self._pinned.get(item_id) or self._rows.get(item_id)
+
+    def set_filter(self, name):
+        """Show only items whose state belongs to the named STATUS_FILTERS entry"""
+        with self._lock:
+            self._states = STATUS_FILTERS.get(name)
+            self._filtered = [item_id for item_id in self._ids if self._matches(item_id)]
+            self._scroll_offset = 0
+        self.refresh(force=True)
+
+    def state_changed(self, item_id):
+        """Re-apply the filter after an item changed state"""
+        if self._states is None:
+            return
+        with self._lock:
+            self._filtered = [i for i in self._ids if self._matches(i)]
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Rebuild the window of materialized rows; returns True if the list changed"""
+        with self._lock:
+            visible_rows = int(self._viewport_height / self.row_height) + 1
+            first = max(0, int(self._scroll_offset / self.row_height) - self.overscan)
+            last = min(len(self._filtered), first + visible_rows + 2 * self.overscan)
+            # The filtered count is part of the key so the bottom spacer grows as items are appended
+            window = (first, last, len(self._filtered))
+            if not force and window == self._window:
+                return False
+            self._window = window
+            
+            window_ids = self._filtered[first:last]
+            rows = {}
+            for item_id in window_ids:
+                if item_id not in self._pinned:
+                    rows[item_id] = self._rows.get(item_id) or self.build_row(item_id)
+            # Rows that left the window are dropped and rebuilt from the item model later
+            self._rows = rows
+            
+            self._top_spacer.height = first * self.row_height
+            self._bottom_spacer.height = (len(self._filtered) - last) * self.row_height
+            self.list_view.controls = (
+                [self._top_spacer]
+                + [self.get_control(item_id) for item_id in window_ids]
+                + [self._bottom_spacer]
+            )
+        
+        if self.on_change:
+            self.on_change(self.list_view)
+        return True
+
+    def _matches(self, item_id):
+        # Caller must hold the lock
+        return self._states is None or self.get_state(item_id) in self._states
+
+    def _on_scroll(self, e):
+        self._scroll_offset = e.pixels or 0
+        if e.viewport_dimension:
+            self._viewport_height = e.viewport_dimension
+        self.refresh()
@@ -0,0 +1,324 @@
+import http.client
+import json
+import os
+import sys
+import time
+import urllib.parse
+from collections import deque
+from threading import Thread, Lock, Event
+
+# Parallel connections per download, and the most one range request asks for
+DEFAULT_CONNECTIONS = 4
+MAX_SEGMENT_SIZE = 8 * 1024 * 1024
+
+# Segments smaller than this cost more in request overhead than they gain in parallelism
+MIN_SEGMENT_SIZE = 1024 * 1024
+
+READ_SIZE = 64 * 1024
+REQUEST_TIMEOUT = 30
+MAX_REDIRECTS = 5
+
+# Segment progress is written next to the .part file at most this often
+STATE_SAVE_INTERVAL = 1.0
+STATE_SUFFIX = ".segments"
+
+# A kept-alive connection the server has since closed fails with one of these on its next request
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+def discard_segmented_part(output_path):
+    """Remove a .part file the segmented downloader left, so no other downloader resumes it as a prefix"""
+    state_path = output_path + ".part" + STATE_SUFFIX
+    if os.path.exists(state_path):
+        for path in (output_path + ".part", state_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def supports_segmented_download(fmt):
+    """True for a resolved yt-dlp format that is one plain HTTP(S) file"""
+    return (
+        fmt.get('protocol') in ("http", "https")
+        and bool(fmt.get('url'))
+        and not fmt.get('fragments')
+        and not fmt.get('requested_formats')
+    )
+
+
+class SegmentedDownloadError(IOError):
+    """Unexpected HTTP response; status is set so retry logic can classify it"""
+    def __init__(self, status, reason):
+        super().__init__(f"HTTP Error {status}: {reason}")
+        self.status = status
+
+
+class SegmentedDownloader:
+    """Downloads one HTTP file over several connections with byte-range requests.
+    
+    The file is split into segments of at most segment_size bytes that the connection
+    workers take in order, so each keep-alive connection is reused across segments.
+    The .part file is preallocated, and the progress of every segment is saved next
+    to it, so an interrupted download resumes each segment where it stopped.
+    
+    progress_hooks receive yt-dlp style status dicts, one call at a time, with an extra
+    'allocated_bytes' for the space the preallocated file already takes. An exception
+    raised by a hook (a pause, for example) stops every connection and is re-raised
+    by download().
+    """
+    def __init__(self, url, output_path, headers=None, connections=DEFAULT_CONNECTIONS,
+                 segment_size=MAX_SEGMENT_SIZE, progress_hooks=(), info_dict=None):
+        self.url = url
+        self.output_path = output_path
+        self.part_path = output_path + ".part"
+        self.state_path = self.part_path + STATE_SUFFIX
+        self.headers = dict(headers or {})
+        self.connections = max(1, int(connections))
+        self.segment_size = max(MIN_SEGMENT_SIZE, int(segment_size))
+        self.progress_hooks = list(progress_hooks)
+        self.info_dict = info_dict or {}
+        self.total_bytes = None
+        
+        self._lock = Lock()  # Serializes progress hooks and state saves
+        self._stop = Event()
+        self._error = None
+        self._segments = []  # [start, end, offset] with end inclusive; offset is the next byte to fetch
+        self._pending = deque()
+        self._downloaded = 0
+        self._session_bytes = 0
+        self._started = None
+        self._last_save = 0
+
+    def probe(self):
+        """Follow redirects and return the file size, or None if the server cannot serve ranges"""
+        for _ in range(MAX_REDIRECTS + 1):
+            parsed = urllib.parse.urlsplit(self.url)
+            conn = self._connect(parsed)
+            try:
+                conn.request("GET", self._path(parsed), headers=dict(self.headers, Range="bytes=0-0"))
+                response = conn.getresponse()
+                response.read()
+                location = response.getheader("Location")
+                if response.status in (301, 302, 303, 307, 308) and location:
+                    self.url = urllib.parse.urljoin(self.url, location)
+                    continue
+                if response.status == 200:
+                    return None  # Ranges ignored; the whole file came back
+                if response.status != 206:
+                    raise SegmentedDownloadError(response.status, response.reason)
+                # Content-Range: bytes 0-0/12345
+                total = (response.getheader("Content-Range") or "").rpartition("/")[2]
+                return int(total) if total.isdigit() else None
+            finally:
+                conn.close()
+        raise IOError("Too many redirects")
+
+    def download(self):
+        """Fetch the file; returns False without touching the disk if the server does not support ranges"""
+        if os.path.exists(self.output_path):
+            # Finished by an earlier attempt
+            self.total_bytes = os.path.getsize(self.output_path)
+            self._report_finished()
+            return True
+        
+        self.total_bytes = self.probe()
+        if not self.total_bytes:
+            return False
+        
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        self._prepare_part_file()
+        self._pending = deque(segment for segment in self._segments if segment[2] <= segment[1])
+        self._downloaded = sum(segment[2] - segment[0] for segment in self._segments)
+        self._started = time.monotonic()
+        # Announce the size before the first block arrives, as yt-dlp's own downloaders do
+        self._report(0)
+        
+        workers = [
+            Thread(target=self._worker, daemon=True, name=f"segment-{i}")
+            for i in range(min(self.connections, len(self._pending)))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        if self._error is not None or self._pending or any(s[2] <= s[1] for s in self._segments):
+            # Keep what arrived so the next attempt resumes every segment
+            self._save_state()
+            raise self._error or IOError("Download ended with missing segments")
+        
+        os.replace(self.part_path, self.output_path)
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
+        self._report_finished()
+        return True
+
+    def _prepare_part_file(self):
+        """Load saved segment progress, or split the file and preallocate it"""
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if state.get('total_bytes') == self.total_bytes and os.path.exists(self.part_path):
+                self._segments = [list(segment) for segment in state['segments']]
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        
+        # A .part without segment state was written front to back, so its length is a finished prefix
+        prefix = 0
+        if os.path.exists(self.part_path):
+            prefix = min(os.path.getsize(self.part_path), self.total_bytes)
+        
+        # Enough segments to keep every connection busy, none larger than segment_size
+        size = min(self.segment_size, max(MIN_SEGMENT_SIZE, -(-self.total_bytes // self.connections)))
+        self._segments = [
+            [start, min(start + size, self.total_bytes) - 1, max(start, min(prefix, start + size))]
+            for start in range(0, self.total_bytes, size)
+        ]
+        # Saved before allocating, so a crash during allocation does not look like finished data
+        self._save_state()
+        
+        with open(self.part_path, "ab") as f:
+            # Reserve the blocks now so a full disk fails here rather than part way through
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, self.total_bytes)
+            else:
+                f.truncate(self.total_bytes)
+
+    def _worker(self):
+        conn = None
+        try:
+            # Unbuffered, so every offset the state file records is already in the file when a crash follows
+            with open(self.part_path, "r+b", buffering=0) as f:
+                while not self._stop.is_set():
+                    with self._lock:
+                        if not self._pending:
+                            return
+                        segment = self._pending.popleft()
+                    conn = self._fetch_segment(conn, segment, f)
+        except BaseException as e:
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+            self._stop.set()
+        finally:
+            if conn:
+                conn.close()
+
+    def _fetch_segment(self, conn, segment, f):
+        """Download the rest of one segment into f; returns the connection for the next segment"""
+        parsed = urllib.parse.urlsplit(self.url)
+        headers = dict(self.headers, Range=f"bytes={segment[2]}-{segment[1]}")
+        
+        reused = conn is not None
+        conn = conn or self._connect(parsed)
+        try:
+            conn.request("GET", self._path(parsed), headers=headers)
+            response = conn.getresponse()
+        except STALE_CONNECTION_ERRORS:
+            if not reused:
+                raise
+            # The server dropped the idle connection; open a fresh one and ask again
+            conn.close()
+            conn = self._connect(parsed)
+            conn.request("GET", self._path(parsed), headers=headers)
+            response = conn.getresponse()
+        
+        if response.status != 206 or not (response.getheader("Content-Range") or "").startswith(f"bytes {segment[2]}-"):
+            response.read()
+            raise SegmentedDownloadError(response.status, response.reason)
+        
+        f.seek(segment[2])
+        while segment[2] <= segment[1]:
+            if self._stop.is_set():
+                # Another connection failed or a hook stopped the download; this connection is mid-body
+                conn.close()
+                return None
+            data = response.read(min(READ_SIZE, segment[1] - segment[2] + 1))
+            if not data:
+                raise http.client.IncompleteRead(b"", segment[1] - segment[2] + 1)
+            view = memoryview(data)
+            while view:
+                # An unbuffered write may take only part of the block
+                view = view[f.write(view):]
+            segment[2] += len(data)
+            self._report(len(data))
+        return conn
+
+    def _report(self, nbytes):
+        with self._lock:
+            self._downloaded += nbytes
+            self._session_bytes += nbytes
+            elapsed = time.monotonic() - self._started
+            speed = self._session_bytes / elapsed if elapsed > 0 else None
+            status = {
+                'status': 'downloading',
+                'filename': self.output_path,
+                'tmpfilename': self.part_path,
+                # The .part file is preallocated, so all of it already takes up disk space
+                'allocated_bytes': self.total_bytes,
+                'downloaded_bytes': self._downloaded,
+                'total_bytes': self.total_bytes,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': (self.total_bytes - self._downloaded) / speed if speed else None,
+                'info_dict': self.info_dict,
+            }
+            for hook in self.progress_hooks:
+                hook(status)
+            if time.monotonic() - self._last_save >= STATE_SAVE_INTERVAL:
+                self._save_state()
+
+    def _report_finished(self):
+        status = {
+            'status': 'finished',
+            'filename': self.output_path,
+            'downloaded_bytes': self.total_bytes,
+            'total_bytes': self.total_bytes,
+            'elapsed': time.monotonic() - self._started if self._started else 0,
+            'info_dict': self.info_dict,
+        }
+        for hook in self.progress_hooks:
+            hook(status)
+
+    def _save_state(self):
+        # Offsets only move after their bytes reached the unbuffered file, so the saved state never runs ahead of it
+        state = {'total_bytes': self.total_bytes, 'segments': [list(segment) for segment in self._segments]}
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+        self._last_save = time.monotonic()
+
+    def _connect(self, parsed):
+        connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        return connection_class(parsed.hostname, parsed.port, timeout=REQUEST_TIMEOUT)
+
+    def _path(self, parsed):
+        return urllib.parse.urlunsplit(("", "", parsed.path or "/", parsed.query, ""))
+
+
+if __name__ == "__main__":
+    # Manual check against any server that supports ranges: python segmented_downloader.py URL OUTPUT [CONNECTIONS]
+    if len(sys.argv) < 3:
+        print("Usage: python segmented_downloader.py URL OUTPUT [CONNECTIONS]")
+        sys.exit(1)
+
+    def print_progress(d):
+        if d['status'] == 'downloading':
+            print(f"\r{d['downloaded_bytes'] / d['total_bytes']:.0%} of {d['total_bytes']} bytes", end="")
+    
+    downloader = SegmentedDownloader(
+        sys.argv[1],
+        sys.argv[2],
+        connections=int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_CONNECTIONS,
+        progress_hooks=[print_progress],
+    )
+    started = time.monotonic()
+    if not downloader.download():
+        print("The server does not support range requests")
+        sys.exit(1)
+    print(f"\nDownloaded {downloader.total_bytes} bytes in {time.monotonic() - started:.1f}s")
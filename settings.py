@@ -13,6 +13,8 @@ import base64
 from PIL import Image
 from typing import Callable, Dict, Any
 
+from panel_mixins import RefreshMixin
+
 VERSION = "1.2.0"  # StreamSaver Pro version
 
 class SystemMonitor:
@@ -99,7 +101,7 @@ class SystemMonitor:
             self.time_history = self.time_history[-self.max_history:]
 
 
-class SettingsPanel:
+class SettingsPanel(RefreshMixin):
     def __init__(self, page: ft.Page, on_action: Callable[[Dict[str, Any]], None]):
         self.page = page
         self.on_action = on_action
@@ -200,6 +202,85 @@ class SettingsPanel:
             bgcolor="#222222",
         )
         
+        self.concurrency_dropdown = ft.Dropdown(
+            label="Max Concurrent Downloads",
+            options=[
+                ft.dropdown.Option("1", "1 download"),
+                ft.dropdown.Option("2", "2 downloads"),
+                ft.dropdown.Option("3", "3 downloads"),
+                ft.dropdown.Option("5", "5 downloads"),
+                ft.dropdown.Option("8", "8 downloads"),
+            ],
+            value="3",
+            width=200,
+            on_change=self.change_max_concurrent,
+            color="#ffffff",
+            bgcolor="#222222",
+        )
+        
+        self.fragment_dropdown = ft.Dropdown(
+            label="Parallel Fragments (HLS/DASH)",
+            options=[
+                ft.dropdown.Option("auto", "Adaptive"),
+                ft.dropdown.Option("1", "1 fragment"),
+                ft.dropdown.Option("2", "2 fragments"),
+                ft.dropdown.Option("4", "4 fragments"),
+                ft.dropdown.Option("8", "8 fragments"),
+                ft.dropdown.Option("16", "16 fragments"),
+            ],
+            value="auto",
+            width=200,
+            on_change=self.change_fragment_concurrency,
+            color="#ffffff",
+            bgcolor="#222222",
+        )
+        
+        self.connections_dropdown = ft.Dropdown(
+            label="Connections per File (HTTP)",
+            options=[
+                ft.dropdown.Option("0", "Off (yt-dlp)"),
+                ft.dropdown.Option("2", "2 connections"),
+                ft.dropdown.Option("4", "4 connections"),
+                ft.dropdown.Option("8", "8 connections"),
+            ],
+            value="4",
+            width=200,
+            on_change=self.change_segmented_connections,
+            color="#ffffff",
+            bgcolor="#222222",
+        )
+        
+        self.bandwidth_dropdown = ft.Dropdown(
+            label="Bandwidth Limit",
+            options=[
+                ft.dropdown.Option("0", "Unlimited"),
+                ft.dropdown.Option("262144", "256 KB/s"),
+                ft.dropdown.Option("1048576", "1 MB/s"),
+                ft.dropdown.Option("2097152", "2 MB/s"),
+                ft.dropdown.Option("5242880", "5 MB/s"),
+                ft.dropdown.Option("10485760", "10 MB/s"),
+            ],
+            value="0",
+            width=200,
+            on_change=self.change_bandwidth_limit,
+            color="#ffffff",
+            bgcolor="#222222",
+        )
+        
+        self.business_hours_switch = ft.Switch(
+            label="Limit only during business hours (09:00-17:00)",
+            value=False,
+            on_change=self.change_bandwidth_schedule,
+            active_color="#ff0000",
+        )
+        
+        self.keep_partial_switch = ft.Switch(
+            label="Keep partial files of removed downloads",
+            value=False,
+            on_change=self.change_keep_partial_files,
+            active_color="#ff0000",
+        )
+        
         self.monitor_switch = ft.Switch(
             label="Enable Resource Monitor",
             value=False,
@@ -212,6 +293,12 @@ class SettingsPanel:
                 [
                     ft.Text("Configuration", size=16, weight=ft.FontWeight.BOLD, color="#ffffff"),
                     ft.Row([self.refresh_dropdown]),
+                    ft.Row([self.concurrency_dropdown]),
+                    ft.Row([self.fragment_dropdown]),
+                    ft.Row([self.connections_dropdown]),
+                    ft.Row([self.bandwidth_dropdown]),
+                    ft.Row([self.business_hours_switch]),
+                    ft.Row([self.keep_partial_switch]),
                     ft.Row([self.monitor_switch]),
                 ],
                 spacing=10,
@@ -296,6 +383,31 @@ class SettingsPanel:
     def change_refresh_rate(self, e):
         self.update_interval = int(self.refresh_dropdown.value)
         
+    def change_max_concurrent(self, e):
+        if self.on_action:
+            self.on_action({"type": "set_max_concurrent", "value": int(self.concurrency_dropdown.value)})
+
+    def change_fragment_concurrency(self, e):
+        if self.on_action:
+            self.on_action({"type": "set_fragment_concurrency", "value": self.fragment_dropdown.value})
+
+    def change_segmented_connections(self, e):
+        if self.on_action:
+            self.on_action({"type": "set_segmented_connections", "value": int(self.connections_dropdown.value)})
+
+    def change_bandwidth_limit(self, e):
+        if self.on_action:
+            self.on_action({"type": "set_bandwidth_limit", "value": int(self.bandwidth_dropdown.value)})
+
+    def change_bandwidth_schedule(self, e):
+        if self.on_action:
+            hours = (9, 17) if self.business_hours_switch.value else None
+            self.on_action({"type": "set_bandwidth_schedule", "value": hours})
+
+    def change_keep_partial_files(self, e):
+        if self.on_action:
+            self.on_action({"type": "set_keep_partial_files", "value": self.keep_partial_switch.value})
+
     def toggle_resource_monitor(self, e):
         if self.monitor_switch.value:
             self.plots_container.visible = True
@@ -377,7 +489,7 @@ class SettingsPanel:
             # Update image widget
             self.chart_image.src_base64 = base64_image
             self.chart_image.visible = True
-            self.page.update()
+            self.refresh(self.chart_image)
             
         except Exception as e:
             print(f"Error updating plots: {str(e)}")
@@ -399,7 +511,7 @@ class SettingsPanel:
             self.disk_text.value = f"Disk: {disk:.1f}%"
             self.network_total_text.value = f"Total Data: {total_data}"
             
-            self.page.update()
+            self.refresh(self.stats_container)
         except Exception as e:
             print(f"Error updating stats: {str(e)}")
             
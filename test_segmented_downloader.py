@@ -0,0 +1,123 @@
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import segmented_downloader
+from segmented_downloader import SegmentedDownloader
+
+# Large enough for several segments at the minimum segment size
+FILE_SIZE = 5 * 1024 * 1024 + 12345
+CONTENT = os.urandom(FILE_SIZE)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves CONTENT over keep-alive connections, honouring single byte ranges unless the server disables them"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+        if match and self.server.ranges:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else FILE_SIZE - 1
+            body = CONTENT[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{FILE_SIZE}")
+        else:
+            body = CONTENT
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(ranges):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.daemon_threads = True
+    server.ranges = ranges
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def range_url():
+    server = start_server(ranges=True)
+    yield f"http://127.0.0.1:{server.server_address[1]}/file.bin"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def plain_url():
+    server = start_server(ranges=False)
+    yield f"http://127.0.0.1:{server.server_address[1]}/file.bin"
+    server.shutdown()
+    server.server_close()
+
+
+class StopDownload(Exception):
+    pass
+
+
+def test_download_matches_source(range_url, tmp_path):
+    output = str(tmp_path / "file.bin")
+    statuses = []
+    downloader = SegmentedDownloader(range_url, output, connections=3, progress_hooks=[statuses.append])
+    
+    assert downloader.download()
+    with open(output, "rb") as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(output + ".part")
+    assert not os.path.exists(output + ".part" + segmented_downloader.STATE_SUFFIX)
+    assert statuses[-1]['status'] == 'finished'
+    assert statuses[-1]['downloaded_bytes'] == FILE_SIZE
+
+
+def test_stop_and_resume(range_url, tmp_path, monkeypatch):
+    # Save segment progress on every block, so the check below sees the newest state
+    monkeypatch.setattr(segmented_downloader, "STATE_SAVE_INTERVAL", 0)
+    # Blocks smaller than a file buffer, which a buffered write would hold back
+    monkeypatch.setattr(segmented_downloader, "READ_SIZE", 4096)
+    output = str(tmp_path / "file.bin")
+    part_path = output + ".part"
+    state_path = part_path + segmented_downloader.STATE_SUFFIX
+
+    def stop_midway(d):
+        if d['status'] == 'downloading' and d['downloaded_bytes'] >= FILE_SIZE // 2:
+            # As if the process were killed here: every byte the saved state counts must already be in the file
+            with open(state_path) as f:
+                segments = json.load(f)['segments']
+            with open(part_path, "rb") as f:
+                part = f.read()
+            for start, end, offset in segments:
+                assert part[start:offset] == CONTENT[start:offset]
+            raise StopDownload()
+    
+    downloader = SegmentedDownloader(range_url, output, connections=3, progress_hooks=[stop_midway])
+    with pytest.raises(StopDownload):
+        downloader.download()
+    assert not os.path.exists(output)
+    assert os.path.exists(state_path)
+    
+    statuses = []
+    downloader = SegmentedDownloader(range_url, output, connections=3, progress_hooks=[statuses.append])
+    assert downloader.download()
+    # The resumed download starts from the bytes the first attempt kept
+    assert statuses[0]['downloaded_bytes'] >= FILE_SIZE // 2
+    with open(output, "rb") as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(state_path)
+
+
+def test_server_without_ranges(plain_url, tmp_path):
+    output = str(tmp_path / "file.bin")
+    downloader = SegmentedDownloader(plain_url, output)
+    
+    assert downloader.download() is False
+    assert os.listdir(tmp_path) == []
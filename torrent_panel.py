@@ -39,6 +39,8 @@ class TorrentDownloader:
         self.files = []
         self.selected_files = []
         self.priority = "Normal"  # Normal, High, Low
+        self.bandwidth_limiter = None  # Optional shared limiter, set by the download queue
+        self.limiter_key = None
         self._download_thread = None
         self._stop_event = False
         self._total_selected_size = 0
@@ -149,6 +151,8 @@ class TorrentDownloader:
             try:
                 while not self._stop_event and self.progress < 100:
                     if not self.is_paused:
+                        tick_start = time.time()
+                        tick_bytes = 0
                         time.sleep(0.5)
                         # Simulate varying download speeds based on seeds/peers
                         self.seeds = random.randint(1, 100)
@@ -167,6 +171,10 @@ class TorrentDownloader:
                                             remaining,
                                             random.uniform(100000, 1000000) * speed_factor
                                         )
+                                        # Wait for this torrent's share of the bandwidth budget
+                                        if self.bandwidth_limiter:
+                                            self.bandwidth_limiter.consume(self.limiter_key, download_amount)
+                                        tick_bytes += download_amount
                                         f['downloaded'] += download_amount
                                         self._downloaded_size += download_amount
                             
@@ -175,7 +183,7 @@ class TorrentDownloader:
                                 self.progress = (self._downloaded_size / self._total_selected_size) * 100
                             
                             # Update speeds and stats
-                            self.download_speed = random.uniform(100000, 1000000) * speed_factor
+                            self.download_speed = tick_bytes / max(time.time() - tick_start, 0.001)
                             self.upload_speed = random.uniform(10000, 100000) * speed_factor
                             self.downloaded = self._downloaded_size
                             self.uploaded = self.downloaded * random.uniform(0.1, 0.5)
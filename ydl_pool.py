@@ -0,0 +1,107 @@
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+import yt_dlp
+from yt_dlp.utils import DEFAULT_OUTTMPL
+
+# Options that change with every download; everything else selects the options profile
+LEASE_OPTIONS = ("outtmpl", "format", "progress_hooks", "postprocessor_hooks", "concurrent_fragment_downloads")
+
+# Idle instances kept per profile, and how long one may sit unused before it is closed
+DEFAULT_MAX_IDLE = 4
+IDLE_TIMEOUT = 5 * 60
+
+
+def get_profile_key(ydl_opts):
+    """Hashable key for the options an instance was built with, leaving out per-download ones"""
+    return tuple(sorted((key, repr(value)) for key, value in ydl_opts.items() if key not in LEASE_OPTIONS))
+
+
+class YoutubeDLPool:
+    """Warm YoutubeDL instances leased to one worker at a time.
+    
+    Building a YoutubeDL parses its options, loads cookies and sets up request
+    handlers; reusing it also keeps its extractor instances (with YouTube's
+    player and signature caches) and keep-alive HTTP sessions. Instances are
+    grouped by options profile, and a lease only swaps the output template,
+    format, fragment concurrency and hooks.
+    """
+    def __init__(self, max_idle=DEFAULT_MAX_IDLE, idle_timeout=IDLE_TIMEOUT):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self._lock = Lock()
+        self._idle = {}  # profile key -> [(returned_at, ydl)], most recently returned last
+        self._closed = False
+
+    @contextmanager
+    def lease(self, ydl_opts):
+        """Borrow an instance configured for ydl_opts; it goes back to the pool when the block exits"""
+        key = get_profile_key(ydl_opts)
+        ydl = self._acquire(key, ydl_opts)
+        try:
+            self._prepare(ydl, ydl_opts)
+            yield ydl
+        except BaseException:
+            # An aborted extraction or download may leave the instance half way; do not reuse it
+            ydl.close()
+            raise
+        self._release(key, ydl)
+
+    def set_max_idle(self, max_idle):
+        """Keep up to max_idle instances per profile, one for each download worker"""
+        with self._lock:
+            self.max_idle = max(1, int(max_idle))
+
+    def close(self):
+        """Close every idle instance; leased ones are closed when they come back"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, {}
+        for entries in idle.values():
+            for _, ydl in entries:
+                ydl.close()
+
+    def _acquire(self, key, ydl_opts):
+        expired = []
+        ydl = None
+        with self._lock:
+            entries = self._idle.get(key, [])
+            now = time.monotonic()
+            while entries:
+                returned_at, candidate = entries.pop()
+                if now - returned_at < self.idle_timeout:
+                    ydl = candidate
+                    break
+                # The server has long dropped its connections
+                expired.append(candidate)
+        for stale in expired:
+            stale.close()
+        
+        if ydl is None:
+            # Per-download options are set on every lease, so build without them
+            ydl = yt_dlp.YoutubeDL({k: v for k, v in ydl_opts.items() if k not in LEASE_OPTIONS})
+        return ydl
+
+    def _prepare(self, ydl, ydl_opts):
+        # The output template and format selector are normally parsed in YoutubeDL.__init__
+        ydl.params['outtmpl']['default'] = ydl_opts.get('outtmpl') or DEFAULT_OUTTMPL['default']
+        ydl.params['format'] = ydl_opts.get('format')
+        ydl.format_selector = ydl.build_format_selector(ydl.params['format']) if ydl.params['format'] else None
+        # Fragment downloaders read this from params when they start
+        ydl.params['concurrent_fragment_downloads'] = ydl_opts.get('concurrent_fragment_downloads', 1)
+        # Downloaders and postprocessors read the hook lists when they are created for a file
+        ydl._progress_hooks = list(ydl_opts.get('progress_hooks') or [])
+        ydl._postprocessor_hooks = list(ydl_opts.get('postprocessor_hooks') or [])
+        ydl._download_retcode = 0
+
+    def _release(self, key, ydl):
+        # Hooks hold references to their queue items
+        ydl._progress_hooks = []
+        ydl._postprocessor_hooks = []
+        with self._lock:
+            entries = self._idle.setdefault(key, [])
+            if not self._closed and len(entries) < self.max_idle:
+                entries.append((time.monotonic(), ydl))
+                return
+        ydl.close()